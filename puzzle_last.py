@@ -2,19 +2,29 @@ import pygame
 import random
 import copy
 import time
-from collections import deque
+import os
+import math
+import mmap
+import struct
+import hashlib
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import heapq
+from bisect import bisect_left
+
+try:
+    import numpy as np  # opsional, cuma dipakai BatchGenerator (tools: build-pack, calibrate)
+except ImportError:
+    np = None
 
 # --- INISIALISASI PYGAME ---
 pygame.init()
 
 WIDTH = 900
 HEIGHT = 600
-screen = pygame.display.set_mode([WIDTH, HEIGHT])
-pygame.display.set_caption('Water Sort Puzzle - Final BFS Project (Fixed Hint)')
+screen = None  # window baru dibuat di main(), jadi modul ini bisa di-import tanpa buka window
 font = pygame.font.Font('freesansbold.ttf', 20)
 large_font = pygame.font.Font('freesansbold.ttf', 40)
-timer = pygame.time.Clock()
 FPS = 60
 
 # --- WARNA RGB ---
@@ -29,37 +39,86 @@ COLOR_MAP = {
     8: (255, 105, 180),  # Hot Pink
     9: (169, 169, 169)   # Dark Gray
 }
+MAX_COLORS = 31  # batas packed board (SLOT_BITS = 5)
+
+
+def extend_palette(palette, count):
+    """Tambah warna procedural (hue geser golden ratio, saturasi/terang bergantian)
+    sampai palette punya count warna"""
+    hue = 0.0
+    while len(palette) < count:
+        k = len(palette)
+        hue = (hue + 0.618033988749895) % 1.0
+        color = pygame.Color(0, 0, 0)
+        color.hsva = (hue * 360, 90 - 25 * (k % 2), 95 - 20 * (k % 3), 100)
+        palette[k + 1] = (color.r, color.g, color.b)
+    return palette
 
 
+extend_palette(COLOR_MAP, MAX_COLORS)
+
+
+# capacity tiap level ada di LEVEL_CONFIG; BOTOL_CAPACITY = capacity level yang sedang aktif,
+# diganti lewat use_level() / set_capacity() (lihat bagian solver)
 BOTOL_CAPACITY = 4
+# solver: engine hint ("astar" / "idastar"), bandingkan dengan `python puzzle_tools.py bench-memory`
+# mix: target mix score generator (median skor walk penuh sampai depth), lihat `bench-mix`
 LEVEL_CONFIG = {
-    1: {"colors": 3, "empty": 2, "depth": 12},
-    2: {"colors": 4, "empty": 2, "depth": 25},
-    3: {"colors": 5, "empty": 2, "depth": 40},
-    4: {"colors": 6, "empty": 2, "depth": 55},
-    5: {"colors": 7, "empty": 2, "depth": 70}
+    1: {"colors": 3, "empty": 2, "capacity": 4, "depth": 12, "mix": 9, "solver": "astar"},
+    2: {"colors": 4, "empty": 2, "capacity": 4, "depth": 25, "mix": 12, "solver": "astar"},
+    3: {"colors": 5, "empty": 2, "capacity": 4, "depth": 40, "mix": 15, "solver": "astar"},
+    4: {"colors": 6, "empty": 2, "capacity": 4, "depth": 55, "mix": 18, "solver": "idastar"},
+    5: {"colors": 7, "empty": 2, "capacity": 4, "depth": 70, "mix": 20, "solver": "idastar"},
+    6: {"colors": 9, "empty": 3, "capacity": 5, "depth": 80, "mix": 26, "solver": "idastar"},
+    7: {"colors": 12, "empty": 3, "capacity": 5, "depth": 90, "mix": 32, "solver": "idastar"},
+    8: {"colors": 14, "empty": 3, "capacity": 6, "depth": 100, "mix": 37, "solver": "idastar"},
+    9: {"colors": 17, "empty": 3, "capacity": 7, "depth": 110, "mix": 44, "solver": "idastar"},
+    10: {"colors": 20, "empty": 4, "capacity": 8, "depth": 120, "mix": 52, "solver": "idastar"}
 }
 
 # ==========================================
 # CLASS GENERATOR: REVERSE BFS WITH CHAOS PRUNING
 # ==========================================
+def match_tubes(tubes, target):
+    """perm dengan tubes[k] == target[perm[k]]: target = tubes dengan urutan tabung lain"""
+    positions = {}
+    for idx, value in enumerate(target):
+        positions.setdefault(value, []).append(idx)
+    return [positions[value].pop() for value in tubes]
+
+
 class WaterSortGenerator:
-    def __init__(self, level):
+    def __init__(self, level, seed=None):
         config = LEVEL_CONFIG.get(level, LEVEL_CONFIG[5])
         self.level = level
+        # RNG sendiri: (level, seed) yang sama selalu menghasilkan board yang sama
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # Laporan generate terakhir (untuk kalibrasi): jumlah langkah mundur yang benar-benar jalan,
+        # dan apakah walk berhenti sebelum target_depth karena tidak ada langkah lagi.
+        # Ini pengganti safety break max_visit=5000 versi BFS lama.
+        self.walk_steps = 0
+        self.walk_mix = 0
+        self.stopped_early = False
+        self.rejected = 0
         self.num_colors = config["colors"]
         self.num_empty = config["empty"]
+        self.capacity = config["capacity"]
 
         self.target_depth = config["depth"] + 10
+        # walk berhenti begitu mix score (get_mix_score) mencapai ini; None = selalu sampai target_depth
+        self.target_mix = config.get("mix")
+        # mode certified: solusi lebih pendek dari ini -> board ditolak, generate ulang
+        self.min_solution = max(self.num_colors, config["depth"] // 5)
 
     def create_goal_state(self):
         """Buat Botol Rapi (Goal)"""
         bottles = []
         available_colors = list(COLOR_MAP.keys())[:self.num_colors]
-        random.shuffle(available_colors)
+        self.rng.shuffle(available_colors)
 
         for color in available_colors:
-            bottles.append([color] * BOTOL_CAPACITY)
+            bottles.append([color] * self.capacity)
         for _ in range(self.num_empty):
             bottles.append([])
         return bottles
@@ -82,82 +141,731 @@ class WaterSortGenerator:
 
         return 0
 
-    def generate_with_bfs(self):
-        goal_state = self.create_goal_state()
-
-        queue = deque([(goal_state, 0, None)])
+    def get_mix_score(self, tubes):
+        """Seberapa teraduk board: pergantian warna di dalam tabung + jumlah warna teratas
+        yang berbeda - capacity x tabung yang sudah penuh & rapi"""
+        transitions = sum(1 for tube in tubes for a, b in zip(tube, tube[1:]) if a != b)
+        solved = sum(1 for tube in tubes if len(tube) == self.capacity and len(set(tube)) == 1)
+        spread = len({tube[-1] for tube in tubes if tube})
+        return transitions + spread - self.capacity * solved
+
+    def create_compact_goal(self):
+        """Goal dalam bentuk compact: slots (bytearray, CAPACITY slot per tabung) + lengths"""
+        goal = self.create_goal_state()
+        cap = self.capacity
+        slots = bytearray(len(goal) * cap)
+        lengths = bytearray(len(goal))
+        for t, tube in enumerate(goal):
+            slots[t * cap:t * cap + len(tube)] = bytes(tube)
+            lengths[t] = len(tube)
+        return slots, lengths
+
+    def compact_to_tubes(self, slots, lengths):
+        cap = self.capacity
+        return [list(slots[t * cap:t * cap + lengths[t]]) for t in range(len(lengths))]
+
+    def reverse_walk(self, slots, lengths, steps, target_mix=None):
+        """Random walk mundur (tuang 1 unit) langsung di slots/lengths, tanpa copy board.
+        Tiap langkah dipilih acak di antara gerakan dengan skor chaos tertinggi
+        (aturan get_chaos_score, gerakan warna sama jadi cadangan terakhir). Kalau target_mix
+        diisi, mix score (get_mix_score) di-update per langkah dan walk berhenti begitu
+        mencapainya; skor terakhir ada di self.walk_mix. Return jumlah langkah."""
+        cap = self.capacity
+        n = len(lengths)
+        empty_score = 5 if self.level < 3 else 1
+        rand = self.rng.random
+        last_src = last_dst = -1
+        # warna teratas tiap tabung (0 = kosong), di-update cuma untuk 2 tabung per langkah
+        tops = bytearray(slots[t * cap + lengths[t] - 1] if lengths[t] else 0 for t in range(n))
+
+        # mix score = sum(trans) + spread - cap * solved, tiap komponen di-update cuma untuk 2 tabung
+        trans = bytearray(sum(1 for k in range(t * cap + 1, t * cap + lengths[t]) if slots[k] != slots[k - 1])
+                          for t in range(n))
+        top_count = [0] * (MAX_COLORS + 1)
+        for top in tops:
+            top_count[top] += 1
+        spread = sum(1 for count in top_count[1:] if count)
+        solved = sum(1 for t in range(n) if lengths[t] == cap and trans[t] == 0)
+        total_trans = sum(trans)
+        self.walk_mix = total_trans + spread - cap * solved
+        if target_mix is not None and self.walk_mix >= target_mix:
+            return 0
 
-        final_state = goal_state
-        visited_count = 0
-        max_visit = 5000  # Safety break
+        for depth in range(steps):
+            best_score = -1
+            ties = 0
+            best_src = best_dst = -1
+            for i in range(n):
+                top = tops[i]
+                if top == 0:
+                    continue
+                # jangan langsung membalik langkah sebelumnya
+                skip = last_src if i == last_dst else i
+                for j in range(n):
+                    if j == i or j == skip:
+                        continue
+                    len_j = lengths[j]
+                    if len_j >= cap:
+                        continue
+                    # Skor chaos (sama dengan get_chaos_score)
+                    if len_j == 0:
+                        score = empty_score
+                    elif tops[j] != top:
+                        score = 10
+                    else:
+                        score = 0
+                    # reservoir sampling: acak merata di antara skor tertinggi
+                    if score > best_score:
+                        best_score = score
+                        ties = 1
+                        best_src, best_dst = i, j
+                    elif score == best_score:
+                        ties += 1
+                        if rand() * ties < 1:
+                            best_src, best_dst = i, j
+
+            if best_src < 0:
+                return depth
+
+            len_src = lengths[best_src] - 1
+            len_dst = lengths[best_dst]
+            color = tops[best_src]
+            old_dst_top = tops[best_dst]
+            slots[best_dst * cap + len_dst] = color
+            slots[best_src * cap + len_src] = 0
+            lengths[best_src] = len_src
+            lengths[best_dst] = len_dst + 1
+            tops[best_dst] = color
+            tops[best_src] = new_src_top = slots[best_src * cap + len_src - 1] if len_src else 0
+            last_src, last_dst = best_src, best_dst
+
+            if target_mix is None:
+                continue
+            if len_src == cap - 1 and trans[best_src] == 0:
+                solved -= 1
+            if new_src_top and new_src_top != color:
+                trans[best_src] -= 1
+                total_trans -= 1
+            if old_dst_top and old_dst_top != color:
+                trans[best_dst] += 1
+                total_trans += 1
+            if len_dst + 1 == cap and trans[best_dst] == 0:
+                solved += 1
+            # warna teratas: color pindah dari src ke dst, new_src_top muncul, old_dst_top tertutup
+            if new_src_top:
+                top_count[new_src_top] += 1
+                if top_count[new_src_top] == 1:
+                    spread += 1
+            if old_dst_top:
+                top_count[old_dst_top] -= 1
+                if top_count[old_dst_top] == 0:
+                    spread -= 1
+            self.walk_mix = total_trans + spread - cap * solved
+            if self.walk_mix >= target_mix:
+                return depth + 1
+
+        return steps
+
+    def certified_walk(self, values, steps):
+        """Random walk mundur di list nilai tabung (packed) pakai unpour_tubes: tiap langkah
+        adalah kebalikan persis dari tuang maju (i, j). Skor chaos sama dengan reverse_walk.
+        Return (moves, boards): moves = langkah maju per langkah mundur, boards = board sebelum
+        tiap langkah mundur ditambah board terakhir."""
+        n = len(values)
+        empty_score = 5 if self.level < 3 else 1
+        rand = self.rng.random
+        moves = []
+        boards = [pack_values(values)]
+        last = None
+
+        for depth in range(steps):
+            best_score = -1
+            ties = 0
+            choice = None
+            for i in range(n):
+                # tabung i menerima lagi air yang dulu dituang dari sini
+                length_i, top_i, _, _, _ = tube_info(values[i])
+                if length_i >= self.capacity:
+                    continue
+                for j in range(n):
+                    if j == i or (j, i) == last:
+                        continue
+                    options = unpour_tubes(values[i], values[j])
+                    if not options:
+                        continue
+                    color = tube_info(values[j])[1]
+                    if top_i == 0:
+                        score = empty_score
+                    elif top_i != color:
+                        score = 10
+                    else:
+                        score = 0
+                    for option in options:
+                        if top_i == 0 and option[1] == 0:
+                            # seluruh tabung satu warna pindah ke tabung kosong: cuma tukar posisi
+                            continue
+                        if score > best_score:
+                            best_score = score
+                            ties = 1
+                            choice = (i, j, option)
+                        elif score == best_score:
+                            ties += 1
+                            if rand() * ties < 1:
+                                choice = (i, j, option)
+            if choice is None:
+                break
+            i, j, (values[i], values[j]) = choice
+            moves.append((i, j))
+            boards.append(pack_values(values))
+            last = (i, j)
+        return moves, boards
+
+    def generate_certified(self, max_attempts=20):
+        """Mode certified: board + solusi yang sudah terbukti (list (src_idx, dst_idx) sampai rapi).
+        Langkah mundurnya kebalikan persis dari tuang maju, jadi jalur mundur yang dibalik
+        adalah solusi. Walk berhenti sendiri kalau board tidak punya pendahulu lagi;
+        solusi < min_solution ditolak dan diulang (paling lama max_attempts, lalu ambil yang terbaik).
+        unpour_tubes & tube_info pakai geometri packed board: pasang dulu lewat use_level(level)."""
+        if BOTOL_CAPACITY != self.capacity:
+            raise ValueError(f"capacity aktif {BOTOL_CAPACITY}, level {self.level} butuh {self.capacity}: "
+                             f"panggil use_level({self.level}) dulu")
+        print(f"Certified Generating Level {self.level} (Target Depth: {self.target_depth})...")
+
+        best = None
+        self.rejected = 0
+        for attempt in range(max_attempts):
+            values = [pack_tube(tube) for tube in self.create_goal_state()]
+            moves, boards = self.certified_walk(values, self.target_depth)
+
+            # Balik jadi urutan maju, potong loop: board yang muncul 2x, termasuk yang cuma beda
+            # urutan tabung (canonical_key). Sesudah dipotong, tabung walk ada di posisi lain di
+            # board pemain: perm[k] = posisi tabung walk k di board pemain.
+            perm = list(range(len(values)))
+            solution = []
+            path = [(canonical_key(boards[-1]), board_tubes(boards[-1]))]
+            seen = {path[0][0]: 0}
+            for (i, j), board in zip(reversed(moves), reversed(boards[:-1])):
+                key = canonical_key(board)
+                walk = board_tubes(board)
+                if key in seen:
+                    cut = seen[key]
+                    for old_key, _ in path[cut + 1:]:
+                        del seen[old_key]
+                    del path[cut + 1:]
+                    del solution[cut:]
+                    perm = match_tubes(walk, path[cut][1])
+                    continue
+                solution.append((perm[i], perm[j]))
+                tubes = [0] * len(walk)
+                for k, value in enumerate(walk):
+                    tubes[perm[k]] = value
+                seen[key] = len(path)
+                path.append((key, tubes))
+
+            if len(solution) >= self.min_solution:
+                self.walk_steps = len(moves)
+                self.stopped_early = len(moves) < self.target_depth
+                return key_to_state(boards[-1]), solution
+            self.rejected += 1
+            if best is None or len(solution) > len(best[1]):
+                best = (key_to_state(boards[-1]), solution)
+                self.walk_steps = len(moves)
+                self.stopped_early = len(moves) < self.target_depth
+
+        return best
 
+    def generate_with_bfs(self):
         print(f"BFS Generating Level {self.level} (Target Depth: {self.target_depth})...")
 
-        while queue:
-            current_state, depth, last_move = queue.popleft()
-            visited_count += 1
+        # Antrian BFS lama cuma pernah berisi 1 node, jadi cukup 1 board yang diubah in-place
+        slots, lengths = self.create_compact_goal()
+        self.walk_steps = self.reverse_walk(slots, lengths, self.target_depth, self.target_mix)
+        # berhenti karena mix score tercapai bukan "berhenti awal" (kehabisan langkah)
+        self.stopped_early = self.walk_steps < self.target_depth and (
+            self.target_mix is None or self.walk_mix < self.target_mix)
+        return self.compact_to_tubes(slots, lengths)
 
-            if depth > 0:
-                final_state = current_state
 
-            if depth >= self.target_depth or visited_count > max_visit:
-                return current_state
+# ==========================================
+# BATCH GENERATOR (NUMPY): K BOARD SEKALIGUS
+# ==========================================
+class BatchGenerator:
+    """Versi vektor dari WaterSortGenerator.generate_with_bfs untuk K board sekaligus:
+    slots (K, tabung, CAPACITY) + fill (K, tabung). Tiap langkah, semua pasangan (src, dst)
+    dinilai dengan aturan get_chaos_score untuk semua board, lalu tiap board memilih acak
+    di antara gerakan valid dengan skor tertinggi. Butuh numpy."""
+
+    def __init__(self, level, seed=None):
+        if np is None:
+            raise RuntimeError("BatchGenerator butuh numpy (pip install numpy)")
+        self.gen = WaterSortGenerator(level, seed)
+        self.rng = np.random.default_rng(seed)
+        self.num_tubes = self.gen.num_colors + self.gen.num_empty
+
+    def create_goal(self, k):
+        """K goal state: warna diacak per board, tabung kosong di belakang"""
+        colors = np.argsort(self.rng.random((k, self.gen.num_colors)), axis=1).astype(np.uint8) + 1
+        slots = np.zeros((k, self.num_tubes, self.gen.capacity), dtype=np.uint8)
+        slots[:, :self.gen.num_colors, :] = colors[:, :, None]
+        fill = np.zeros((k, self.num_tubes), dtype=np.int8)
+        fill[:, :self.gen.num_colors] = self.gen.capacity
+        return slots, fill
+
+    def mix_scores(self, slots, fill, tops):
+        """get_mix_score untuk semua board sekaligus"""
+        cap = self.gen.capacity
+        inside = np.arange(1, cap) < fill[:, :, None]
+        transitions = ((slots[:, :, 1:] != slots[:, :, :-1]) & inside).sum(axis=(1, 2))
+        solved = ((fill == cap) & (slots == slots[:, :, :1]).all(axis=2)).sum(axis=1)
+        present = np.zeros((len(fill), MAX_COLORS + 1), dtype=bool)
+        present[np.arange(len(fill))[:, None], tops] = True
+        return transitions + present[:, 1:].sum(axis=1) - cap * solved
+
+    def generate(self, k):
+        """K board acak. Return (slots, fill, walk_steps, stuck): stuck[b] = board b kehabisan langkah
+        sebelum target_depth (berhenti awal, sama seperti stopped_early). Board yang berhenti
+        karena mencapai target_mix juga punya walk_steps < target_depth, tapi stuck-nya False."""
+        cap = self.gen.capacity
+        n = self.num_tubes
+        # key = skor chaos << 16 | noise 16 bit: argmax = acak merata di antara skor tertinggi
+        empty_key = np.int32((5 if self.gen.level < 3 else 1) << 16)
+        chaos_key = np.int32(10 << 16)
+        not_self = ~np.eye(n, dtype=bool)
+        slots, fill = self.create_goal(k)
+        rows = np.arange(k)
+        tops = np.where(fill > 0, slots[rows[:, None], np.arange(n), np.maximum(fill - 1, 0)], 0)
+        last_src = np.zeros(k, dtype=np.intp)
+        last_dst = np.zeros(k, dtype=np.intp)
+        walk_steps = np.zeros(k, dtype=np.int32)
+        active = np.ones(k, dtype=bool)
+        stuck = np.zeros(k, dtype=bool)
+
+        for depth in range(self.gen.target_depth):
+            # valid[b, i, j]: board b boleh tuang 1 unit dari i ke j
+            valid = (fill > 0)[:, :, None] & (fill < cap)[:, None, :] & not_self
+            if depth:
+                # jangan langsung membalik langkah sebelumnya
+                valid[rows, last_dst, last_src] = False
+            score = np.where((fill == 0)[:, None, :], empty_key,
+                             (tops[:, :, None] != tops[:, None, :]) * chaos_key)
+            noise = np.frombuffer(self.rng.bytes(2 * k * n * n), dtype=np.uint16).reshape(k, n, n)
+            key = np.where(valid, score | noise, -1).reshape(k, n * n)
+            best = key.argmax(axis=1)
+            no_move = active & (key[rows, best] < 0)
+            stuck |= no_move
+            active &= ~no_move
+            if not active.any():
+                break
+
+            b = rows[active]
+            s, d = np.divmod(best[active], n)
+            color = tops[b, s]
+            slots[b, d, fill[b, d]] = color
+            fill[b, d] += 1
+            fill[b, s] -= 1
+            slots[b, s, fill[b, s]] = 0
+            tops[b, d] = color
+            tops[b, s] = np.where(fill[b, s] > 0, slots[b, s, np.maximum(fill[b, s] - 1, 0)], 0)
+            last_src[b], last_dst[b] = s, d
+            walk_steps[b] += 1
+            if self.gen.target_mix is not None:
+                active &= self.mix_scores(slots, fill, tops) < self.gen.target_mix
+
+        return slots, fill, walk_steps, stuck
+
+    @staticmethod
+    def to_tubes(slots, fill, i):
+        """Board ke-i dari hasil generate() -> list of lists (format tubes game)"""
+        return [slots[i, t, :fill[i, t]].tolist() for t in range(slots.shape[1])]
 
-            # --- EXPAND NODE (Cari Anak) ---
-            potential_moves = []
 
-            for i in range(len(current_state)):
-                for j in range(len(current_state)):
-                    if i == j:
-                        continue
+# ==========================================
+# DEDUP: CANONICAL HASH + BLOOM FILTER
+# ==========================================
+def canonical_board(tubes):
+    """Bentuk kanonik board yang tidak tergantung urutan tabung & nama warna (tuple of tuples).
+    Warna diberi label dari strukturnya (refinement: posisi di tabung + isi tabung dalam label
+    sekarang) sampai tidak berubah. Kalau masih ada warna yang seri, tiap anggota kelas seri
+    pertama dicoba dipisah lalu di-refine lagi, hasil terkecil yang dipakai (lihat CanonicalSearch)."""
+    search = CanonicalSearch(tubes)
+    search.run(_refine_labels(tubes, {c: 0 for tube in tubes for c in tube}), [])
+    return search.best
+
+
+class CanonicalSearch:
+    """Pencarian individualisasi-refinement ala nauty. Cabang yang pasti hasilnya sama dipotong:
+    - warna kembar: menukar dua warna saja tidak mengubah board (mis. dua tabung rapi)
+    - automorfisme: leaf yang sama dengan leaf pertama memberi pemetaan warna yang mempertahankan
+      board; sisa cabang itu dilewati, dan kandidat yang satu orbit dengan yang sudah dicoba di-skip"""
+
+    def __init__(self, tubes):
+        self.tubes = tubes
+        self.board = sorted(map(tuple, tubes))
+        self.first = None  # (label, path, form) leaf pertama
+        self.best = None
+        self.best_label = None
+        self.automorphisms = []
+
+    def form(self, label):
+        return tuple(sorted(tuple(label[c] + 1 for c in tube) for tube in self.tubes))
+
+    def run(self, label, path):
+        """Cari di subtree ini. Return level tujuan lompat balik (None = lanjut biasa)"""
+        classes = {}
+        for c, l in label.items():
+            classes.setdefault(l, []).append(c)
+        tied = [l for l in sorted(classes) if len(classes[l]) > 1]
+        if not tied:
+            return self.leaf(label, path)
+        tried = []
+        for v in classes[tied[0]]:
+            if tried and (any(self.twins(u, v) for u in tried) or self.same_orbit(path, tried, v)):
+                continue
+            tried.append(v)
+            # pisahkan v dari kelasnya: label 2v-1 < 2v (anggota lain)
+            split = {c: 2 * l - (c == v) for c, l in label.items()}
+            jump = self.run(_refine_labels(self.tubes, split), path + [v])
+            if jump is not None and jump < len(path):
+                return jump
+        return None
 
-                    src, dst = current_state[i], current_state[j]
+    def leaf(self, label, path):
+        form = self.form(label)
+        if self.first is None:
+            self.first = (label, path, form)
+            self.best = form
+            self.best_label = label
+            return None
+        first_label, first_path, first_form = self.first
+        if form == first_form:
+            self.automorphisms.append(self.mapping(first_label, label))
+            # subtree sesudah titik cabang = bayangan subtree leaf pertama, sudah dicari semua
+            depth = 0
+            while depth < min(len(path), len(first_path)) and path[depth] == first_path[depth]:
+                depth += 1
+            return depth
+        if form == self.best:
+            self.automorphisms.append(self.mapping(self.best_label, label))
+        elif form < self.best:
+            self.best = form
+            self.best_label = label
+        return None
 
-                    # Syarat Valid Reverse
-                    if len(src) > 0 and len(dst) < BOTOL_CAPACITY:
-                        if last_move and last_move == (j, i):
-                            continue
+    @staticmethod
+    def mapping(label_a, label_b):
+        """Warna di leaf a -> warna dengan label sama di leaf b (automorfisme kalau form-nya sama)"""
+        colors = {l: c for c, l in label_b.items()}
+        return {c: colors[l] for c, l in label_a.items()}
+
+    def twins(self, a, b):
+        """True kalau menukar warna a dan b saja menghasilkan board yang sama"""
+        swap = {a: b, b: a}
+        return sorted(tuple(swap.get(c, c) for c in tube) for tube in self.tubes) == self.board
+
+    def same_orbit(self, path, tried, v):
+        """v satu orbit dengan warna yang sudah dicoba, di bawah automorfisme yang menetapkan path"""
+        parent = {}
+
+        def find(c):
+            while parent.get(c, c) != c:
+                c = parent[c]
+            return c
+
+        for gamma in self.automorphisms:
+            if all(gamma[c] == c for c in path):
+                for c, d in gamma.items():
+                    rc, rd = find(c), find(d)
+                    if rc != rd:
+                        parent[rc] = rd
+        root = find(v)
+        return any(find(u) == root for u in tried)
+
+
+def _refine_labels(tubes, label):
+    while True:
+        signature = {c: [] for c in label}
+        for tube in tubes:
+            # isi tabung dalam label sekarang + posisi-posisi warna itu sendiri di tabung ini
+            pattern = tuple(label[c] for c in tube)
+            where = {}
+            for pos, c in enumerate(tube):
+                where.setdefault(c, []).append(pos)
+            for c, positions in where.items():
+                signature[c].append((tuple(positions), pattern))
+        keyed = {c: (label[c], tuple(sorted(sig))) for c, sig in signature.items()}
+        ranks = {key: r for r, key in enumerate(sorted(set(keyed.values())))}
+        new = {c: ranks[key] for c, key in keyed.items()}
+        if len(ranks) == len(set(label.values())):
+            return new
+        label = new
+
+
+def canonical_board_hash(tubes):
+    """Hash 64-bit stabil (sama di semua process / mesin) dari canonical_board"""
+    data = bytearray()
+    for tube in canonical_board(tubes):
+        data.append(len(tube))
+        data.extend(tube)
+    return int.from_bytes(hashlib.blake2b(bytes(data), digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    """Set hash 64-bit yang hemat memori: ~1.8 byte per item di error_rate 0.001.
+    Bisa salah bilang "sudah ada" (false positive), tidak pernah salah bilang "belum ada"."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, h):
+        # double hashing: posisi ke-i = h1 + i * h2
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, h):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+    def add(self, h):
+        """Tambah hash, return True kalau belum ada sebelumnya"""
+        new = False
+        bits = self.bits
+        for p in self._positions(h):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                bits[p >> 3] |= 1 << (p & 7)
+                new = True
+        if new:
+            self.count += 1
+        return new
 
-                        # Hitung Skor Chaos
-                        score = self.get_chaos_score(src, dst)
 
-                        # PRUNING: Hanya ambil gerakan yang punya skor chaos > 0
-                        if score > 0:
-                            potential_moves.append((score, i, j))
+# ==========================================
+# LEVEL POOL: LEVEL SIAP PAKAI DARI WORKER PROCESS
+# ==========================================
+LEVEL_POOL_SIZE = 3     # jumlah board siap pakai per level
+LEVEL_POOL_WORKERS = 2
+# True: generate_certified (board + solusi terbukti, hint pertama tanpa search). Walk mundurnya
+# berhenti sendiri jauh sebelum depth / mix tier, jadi board-nya lebih gampang; default generate_with_bfs
+CERTIFIED_LEVELS = False
+SEEN_BOARDS_CAPACITY = 100000  # board yang sudah dibuat / dimainkan, dipakai untuk buang duplikat
 
-            # Kalau tidak ada gerakan chaos, cari gerakan apa saja
-            if not potential_moves:
-                for i in range(len(current_state)):
-                    for j in range(len(current_state)):
-                        if i == j:
-                            continue
-                        if len(current_state[i]) > 0 and len(current_state[j]) < BOTOL_CAPACITY:
-                            if last_move and last_move == (j, i):
-                                continue
-                            potential_moves.append((1, i, j))
 
-            if not potential_moves:
-                continue
+def generate_level_job(level):
+    """Dijalankan di worker process. Return (tubes, solution), solution None kalau tidak certified"""
+    gen = WaterSortGenerator(level)
+    if CERTIFIED_LEVELS:
+        use_level(level)
+        return gen.generate_certified()
+    return gen.generate_with_bfs(), None
+
+
+class LevelPool:
+    """Simpan LEVEL_POOL_SIZE board (tubes, solution) siap pakai untuk tiap level di LEVEL_CONFIG.
+    Board baru dibuat di worker process sambil pemain main, setup_level tinggal ambil."""
+
+    def __init__(self, size=LEVEL_POOL_SIZE, workers=LEVEL_POOL_WORKERS, levels=None):
+        self.size = size
+        self.workers = workers
+        self.executor = None
+        if levels is None:
+            levels = list(LEVEL_CONFIG)
+        self.ready = {level: deque() for level in levels}
+        self.pending = {level: [] for level in levels}
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+
+    def refill(self):
+        """Dipanggil tiap frame: pindahkan hasil worker ke ready, lalu pesan board baru kalau kurang"""
+        if not self.ready:
+            return
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        for level, futures in self.pending.items():
+            for future in [f for f in futures if f.done()]:
+                futures.remove(future)
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    print(f"Level pool error (level {level}): {e}")
+                    continue
+                # board yang sama (atau cuma beda urutan tabung / nama warna) tidak dipakai lagi
+                if seen_boards.add(canonical_board_hash(entry[0])):
+                    self.ready[level].append(entry)
+                else:
+                    self.duplicates += 1
+            while len(self.ready[level]) + len(futures) < self.size:
+                futures.append(self.executor.submit(generate_level_job, level))
+
+    def take(self, level):
+        """(tubes, solution) siap pakai untuk level ini, atau None (miss) kalau pool kosong"""
+        if level in self.ready:
+            self.refill()
+            if self.ready[level]:
+                self.hits += 1
+                return self.ready[level].popleft()
+        self.misses += 1
+        return None
 
-            # Acak sedikit biar gak deterministik
-            random.shuffle(potential_moves)
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "duplicates": self.duplicates,
+            "ready": {level: len(boards) for level, boards in self.ready.items()},
+        }
 
-            # Urutkan berdasarkan skor chaos tertinggi
-            potential_moves.sort(key=lambda x: x[0], reverse=True)
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
 
-            # Ambil 1 langkah terbaik (Greedy-BFS)
-            best_move = potential_moves[0]
-            score, src_idx, dst_idx = best_move
 
-            # Eksekusi State Baru
-            new_state = copy.deepcopy(current_state)
-            water = new_state[src_idx].pop()
-            new_state[dst_idx].append(water)
+# ==========================================
+# LEVEL PACK: LIBRARY LEVEL DI DISK (MMAP)
+# ==========================================
+# Format file (little-endian), dibuat dengan `python puzzle_tools.py build-pack`:
+#   header  : magic, version, slot_bits, index_count, record_count
+#   index   : index_count x (tier, difficulty, colors, empty, capacity, tube_bytes, record_size,
+#             offset, count), urut (tier, difficulty); offset = posisi byte record pertama di file
+#   records : per entry index, count x record_size byte: (colors + empty) x tube_bytes (nilai
+#             pack_tube), flags. Ukuran record ikut tier-nya sendiri (tabung & capacity tier itu),
+#             jadi tier kecil tidak ikut membayar ukuran tier terbesar.
+# difficulty = solution_len (panjang solusi yang diketahui, 0 = tidak diketahui)
+LEVEL_PACK_PATH = "levels.wslp"
+PACK_MAGIC = b"WSLP"
+PACK_VERSION = 3
+PACK_HEADER = struct.Struct("<4sHBII")
+PACK_INDEX = struct.Struct("<BBBBBBHII")
+PACK_CERTIFIED = 1  # flags: solusi certified dari generator
+
+
+def write_level_pack(path, entries):
+    """entries: iterable (tier, tubes, solution_len, flags). Record disimpan sebagai byte mentah
+    per (tier, difficulty), jadi jutaan level cukup memori seukuran file-nya."""
+    buckets = {}
+    for tier, tubes, solution_len, flags in entries:
+        colors = len({c for tube in tubes for c in tube})
+        capacity = sum(len(tube) for tube in tubes) // colors
+        tube_bytes = (SLOT_BITS * capacity + 7) // 8
+        record = bytearray(len(tubes) * tube_bytes + 1)
+        for t, tube in enumerate(tubes):
+            record[t * tube_bytes:(t + 1) * tube_bytes] = pack_tube(tube).to_bytes(tube_bytes, "little")
+        record[-1] = flags
+        key = (tier, min(solution_len, 255), colors, len(tubes) - colors, capacity)
+        buckets.setdefault(key, bytearray()).extend(record)
+
+    keys = sorted(buckets)
+    offset = PACK_HEADER.size + len(keys) * PACK_INDEX.size
+    index = []
+    record_count = 0
+    for key in keys:
+        tier, difficulty, colors, empty, capacity = key
+        tube_bytes = (SLOT_BITS * capacity + 7) // 8
+        record_size = (colors + empty) * tube_bytes + 1
+        count = len(buckets[key]) // record_size
+        index.append(PACK_INDEX.pack(tier, difficulty, colors, empty, capacity, tube_bytes, record_size,
+                                     offset, count))
+        offset += len(buckets[key])
+        record_count += count
+    with open(path, "wb") as f:
+        f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, SLOT_BITS, len(keys), record_count))
+        f.writelines(index)
+        for key in keys:
+            f.write(buckets[key])
+    return record_count
+
+
+class LevelLibrary:
+    """Baca level pack lewat mmap. Yang dibaca saat buka cuma header + index kecil,
+    record dibaca satu-satu saat dibutuhkan."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slot_bits, index_count, self.record_count = PACK_HEADER.unpack_from(self.data, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            self.close()
+            raise ValueError(f"{path}: bukan level pack versi {PACK_VERSION}")
+        # tier -> list (difficulty, count, (colors, empty, capacity, tube_bytes, record_size, offset))
+        self.index = {}
+        for k in range(index_count):
+            (tier, difficulty, colors, empty, capacity, tube_bytes, record_size,
+             offset, count) = PACK_INDEX.unpack_from(self.data, PACK_HEADER.size + k * PACK_INDEX.size)
+            layout = (colors, empty, capacity, tube_bytes, record_size, offset)
+            self.index.setdefault(tier, []).append((difficulty, count, layout))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def count(self, tier, difficulty=None):
+        return sum(c for d, c, _ in self.index.get(tier, []) if difficulty is None or d == difficulty)
+
+    def record_bytes(self, tier):
+        """Byte per level di tier ini (rata-rata kalau tier-nya punya lebih dari satu layout)"""
+        entries = self.index.get(tier, [])
+        total = sum(c for _, c, _ in entries)
+        return sum(c * layout[4] for _, c, layout in entries) / total if total else 0
+
+    def read(self, difficulty, layout, k):
+        """Record ke-k dari satu entry index -> (tubes, info)"""
+        colors, empty, capacity, tube_bytes, record_size, offset = layout
+        offset += k * record_size
+        record = self.data[offset:offset + record_size]
+        slot_mask = (1 << self.slot_bits) - 1
+        tubes = []
+        for t in range(colors + empty):
+            value = int.from_bytes(record[t * tube_bytes:(t + 1) * tube_bytes], "little")
+            tube = []
+            while value:
+                tube.append(value & slot_mask)
+                value >>= self.slot_bits
+            tubes.append(tube)
+        info = {"colors": colors, "empty": empty, "capacity": capacity, "solution_len": difficulty,
+                "flags": record[-1]}
+        return tubes, info
+
+    def pick(self, tier, difficulty=None, rng=random):
+        """Record acak dari tier (dan difficulty) ini, atau None kalau tidak ada"""
+        total = self.count(tier, difficulty)
+        if total == 0:
+            return None
+        k = rng.randrange(total)
+        for d, count, layout in self.index[tier]:
+            if difficulty is not None and d != difficulty:
+                continue
+            if k < count:
+                return self.read(d, layout, k)
+            k -= count
+
+    def take(self, level, attempts=8):
+        """Sama seperti LevelPool.take: (tubes, solution) atau None. Solusinya tidak disimpan di pack.
+        Board yang sudah pernah keluar (seen_boards) diganti pilihan acak lain, paling banyak attempts kali."""
+        for _ in range(attempts):
+            picked = self.pick(level)
+            if picked is None or picked[1]["capacity"] != LEVEL_CONFIG[level]["capacity"]:
+                return None
+            if seen_boards.add(canonical_board_hash(picked[0])):
+                return picked[0], None
+        return None
 
-            # Masukkan ke Queue Belakang
-            queue.append((new_state, depth + 1, (src_idx, dst_idx)))
 
-        return final_state
+def open_level_library(path=LEVEL_PACK_PATH):
+    """LevelLibrary kalau file pack ada dan bisa dibuka, selain itu None"""
+    if not os.path.exists(path):
+        return None
+    try:
+        library = LevelLibrary(path)
+    except (OSError, ValueError) as e:
+        print(f"Level pack tidak bisa dibuka: {e}")
+        return None
+    return library
 
 
 # ==========================================
@@ -167,8 +875,10 @@ class WaterSortGenerator:
 current_level = 1
 tubes = []
 initial_tubes = []
+level_solution = None  # solusi certified dari generator (urutan layar), kalau ada
 selected_tube = None
 hint_move = None  # (src_idx, dst_idx) for visual hint
+hint_pending = False  # H sudah ditekan, tunggu hasil worker
 game_won = False
 loading = True
 
@@ -182,88 +892,406 @@ stars = 0
 # UI states: 'menu', 'level_select', 'playing'
 ui_state = 'menu'
 
+level_library = None  # LevelLibrary dari LEVEL_PACK_PATH, dibuka di main()
+seen_boards = BloomFilter(SEEN_BOARDS_CAPACITY)
+level_pool = LevelPool()
+
 # ---------- A* HINT FUNCTIONS ----------
+# Solver tidak pakai list-of-lists, tapi board packed jadi satu int:
+# - tiap slot SLOT_BITS bit, 0 = kosong, warna mulai dari 1
+# - tiap tabung TUBE_BITS bit, slot 0 = dasar tabung
+# - tabung i ada di bit i * TUBE_BITS
+# - 1 bit sentinel di atas tabung terakhir, jadi jumlah tabung ikut tersimpan
+
+SLOT_BITS = 5  # cukup untuk warna 1..31 (MAX_COLORS)
+SLOT_MASK = (1 << SLOT_BITS) - 1
+TUBE_BITS = SLOT_BITS * BOTOL_CAPACITY
+TUBE_MASK = (1 << TUBE_BITS) - 1
+
+# RUN_FILL[k] * warna = k slot berturut-turut dengan warna itu
+RUN_FILL = [sum(1 << (s * SLOT_BITS) for s in range(k)) for k in range(BOTOL_CAPACITY + 1)]
+
+# tube value -> (length, top_color, top_run, h, done)
+_tube_info_cache = {}
+
+# Batas entry tiap cache per tabung (tube_info, pour_tubes, unpour_tubes). Worker hint & level pool
+# hidup seharian, jadi cache yang penuh dikosongkan (isinya cepat terisi lagi dari solve berikutnya).
+TUBE_CACHE_SIZE = 20000
+
+
+def set_capacity(capacity):
+    """Ganti capacity tabung packed board. TUBE_BITS, RUN_FILL dan semua cache per tabung
+    tergantung capacity, jadi ikut diganti / dikosongkan."""
+    global BOTOL_CAPACITY, TUBE_BITS, TUBE_MASK, RUN_FILL
+    if capacity == BOTOL_CAPACITY:
+        return
+    BOTOL_CAPACITY = capacity
+    TUBE_BITS = SLOT_BITS * capacity
+    TUBE_MASK = (1 << TUBE_BITS) - 1
+    RUN_FILL = [sum(1 << (s * SLOT_BITS) for s in range(k)) for k in range(capacity + 1)]
+    clear_tube_caches()
+
+
+def clear_tube_caches():
+    _tube_info_cache.clear()
+    _pour_cache.clear()
+    _unpour_cache.clear()
+
+
+def use_level(level):
+    """Pasang geometri board level ini (capacity), return config-nya"""
+    config = LEVEL_CONFIG.get(level, LEVEL_CONFIG[5])
+    set_capacity(config["capacity"])
+    return config
+
+
+def pack_tube(tube):
+    value = 0
+    for slot, color in enumerate(tube):
+        value |= color << (slot * SLOT_BITS)
+    return value
+
+
+def unpack_tube(value):
+    tube = []
+    while value:
+        tube.append(value & SLOT_MASK)
+        value >>= SLOT_BITS
+    return tube
+
 
 def state_to_key(state):
-    return tuple(tuple(t) for t in state)
+    """List-of-lists (tubes di game) -> packed int board"""
+    return pack_values([pack_tube(tube) for tube in state])
 
 
-def is_goal_state(state):
-    for tube in state:
-        if len(tube) == 0:
-            continue
-        if len(tube) < BOTOL_CAPACITY:
-            return False
-        first = tube[0]
-        for c in tube:
-            if c != first:
-                return False
-    return True
+def pack_values(values):
+    """List nilai tabung (pack_tube) -> packed int board"""
+    board = 1 << (len(values) * TUBE_BITS)
+    for i, value in enumerate(values):
+        board |= value << (i * TUBE_BITS)
+    return board
 
 
-def heuristic(state):
-    h = 0
-    for tube in state:
-        if not tube:
-            continue
-        for i in range(len(tube) - 1):
+def key_to_state(board):
+    """Packed int board -> list-of-lists, urutan tabung sama"""
+    return [unpack_tube(value) for value in board_tubes(board)]
+
+
+def board_tubes(board):
+    n = (board.bit_length() - 1) // TUBE_BITS
+    return [(board >> (i * TUBE_BITS)) & TUBE_MASK for i in range(n)]
+
+
+def tube_info(value):
+    info = _tube_info_cache.get(value)
+    if info is None:
+        tube = unpack_tube(value)
+        length = len(tube)
+        top = tube[-1] if tube else 0
+        run = 0
+        for c in reversed(tube):
+            if c != top:
+                break
+            run += 1
+        h = 0
+        for i in range(length - 1):
             if tube[i] != tube[i + 1]:
                 h += 1
         # if tube not full, penalize a bit (we want full same-colored tubes)
-        if len(tube) < BOTOL_CAPACITY:
-            h += (BOTOL_CAPACITY - len(tube))
+        if tube and length < BOTOL_CAPACITY:
+            h += BOTOL_CAPACITY - length
+        done = length == 0 or (length == BOTOL_CAPACITY and run == length)
+        info = (length, top, run, h, done)
+        if len(_tube_info_cache) >= TUBE_CACHE_SIZE:
+            _tube_info_cache.clear()
+        _tube_info_cache[value] = info
+    return info
+
+
+def is_goal_state(board):
+    for value in board_tubes(board):
+        if not tube_info(value)[4]:
+            return False
+    return True
+
+
+def heuristic(board):
+    h = 0
+    for value in board_tubes(board):
+        h += tube_info(value)[3]
     return h
 
 
-def valid_moves_from(state):
+def valid_moves_from(board):
+    return _valid_moves(board_tubes(board))
+
+
+def _valid_moves(values):
+    infos = [tube_info(value) for value in values]
     moves = []
-    n = len(state)
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            src = state[i]
-            dst = state[j]
-            if len(src) == 0 or len(dst) >= BOTOL_CAPACITY:
+    for i, (src_len, src_color, _, _, _) in enumerate(infos):
+        if src_len == 0:
+            continue
+        for j, (dst_len, dst_color, _, _, _) in enumerate(infos):
+            if i == j or dst_len >= BOTOL_CAPACITY:
                 continue
-            src_color = src[-1]
-            if len(dst) > 0 and dst[-1] != src_color:
+            if dst_len > 0 and dst_color != src_color:
                 continue
             moves.append((i, j))
     return moves
 
 
-def apply_move(state, move):
-    i, j = move
-    new_state = [list(t) for t in state]
-    if len(new_state[i]) == 0:
-        return None
-    src_color = new_state[i][-1]
-    amount = 0
-    for k in range(len(new_state[i]) - 1, -1, -1):
-        if new_state[i][k] == src_color:
-            amount += 1
-        else:
-            break
-    space = BOTOL_CAPACITY - len(new_state[j])
-    final_amount = min(amount, space)
-    for _ in range(final_amount):
-        new_state[j].append(new_state[i].pop())
-    return new_state
+def solver_moves_from(board):
+    """valid_moves_from tanpa langkah yang hasilnya cuma permutasi tabung (khusus solver,
+    validasi langkah pemain tetap pakai aturan lengkap):
+    - tabung satu warna dituang utuh ke tabung kosong -> board sama, cuma pindah posisi
+    - beberapa tabung tujuan yang isinya identik (mis. 2 tabung kosong) -> cukup yang pertama
+    - beberapa tabung sumber yang isinya identik -> cukup yang pertama"""
+    return _solver_moves(board_tubes(board))
 
 
+def _solver_moves(values):
+    infos = [tube_info(value) for value in values]
+    moves = []
+    seen_src = set()
+    for i, (src_len, src_color, src_run, _, _) in enumerate(infos):
+        if src_len == 0 or values[i] in seen_src:
+            continue
+        seen_src.add(values[i])
+        seen_dst = set()
+        for j, (dst_len, dst_color, _, _, _) in enumerate(infos):
+            if i == j or dst_len >= BOTOL_CAPACITY:
+                continue
+            if dst_len > 0:
+                if dst_color != src_color:
+                    continue
+            elif src_run == src_len:
+                continue
+            if values[j] in seen_dst:
+                continue
+            seen_dst.add(values[j])
+            moves.append((i, j))
+    return moves
 
-def astar_find_hint(start_state, time_limit=0.8, max_nodes=20000):
-    start_key = state_to_key(start_state)
-    if is_goal_state(start_state):
-        return None
+
+# Hash-consing hasil tuang: (src, dst) -> (src baru, dst baru, dh).
+# Tabung = int immutable, jadi tabung hasil tuang yang sama dipakai bersama oleh semua board.
+_pour_cache = {}
+
+
+def pour_tubes(src, dst):
+    key = (src, dst)
+    result = _pour_cache.get(key)
+    if result is None:
+        src_len, src_color, src_run, src_h, _ = tube_info(src)
+        dst_len, _, _, dst_h, _ = tube_info(dst)
+        amount = min(src_run, BOTOL_CAPACITY - dst_len)
+        new_src = src & ((1 << ((src_len - amount) * SLOT_BITS)) - 1)
+        new_dst = dst | ((src_color * RUN_FILL[amount]) << (dst_len * SLOT_BITS))
+        dh = tube_info(new_src)[3] + tube_info(new_dst)[3] - src_h - dst_h
+        result = (new_src, new_dst, dh)
+        if len(_pour_cache) >= TUBE_CACHE_SIZE:
+            _pour_cache.clear()
+        _pour_cache[key] = result
+    return result
+
+
+# Kebalikan pour_tubes: (src, dst) sesudah tuang -> list (src, dst) sebelum tuang
+_unpour_cache = {}
+
+
+def unpour_tubes(src, dst):
+    """Semua (pre_src, pre_dst) yang kalau dituang pre_src -> pre_dst (langkah legal,
+    tuang seluruh run teratas sebanyak muat) hasilnya persis (src, dst)."""
+    key = (src, dst)
+    result = _unpour_cache.get(key)
+    if result is None:
+        result = []
+        dst_len, color, run, _, _ = tube_info(dst)
+        src_len = tube_info(src)[0]
+        for amount in range(1, min(run, BOTOL_CAPACITY - src_len) + 1):
+            pre_dst = dst & ((1 << ((dst_len - amount) * SLOT_BITS)) - 1)
+            if pre_dst and tube_info(pre_dst)[1] != color:
+                continue
+            pre_src = src | ((color * RUN_FILL[amount]) << (src_len * SLOT_BITS))
+            # run di pre_src bisa lebih panjang dari amount: cek tuang maju memang berhenti di sini
+            if pour_tubes(pre_src, pre_dst)[:2] == (src, dst):
+                result.append((pre_src, pre_dst))
+        if len(_unpour_cache) >= TUBE_CACHE_SIZE:
+            _unpour_cache.clear()
+        _unpour_cache[key] = result
+    return result
+
+
+def pour(board, move):
+    """apply_move + perubahan heuristic. Cuma 2 tabung yang berubah, jadi
+    h anak = h parent + dh (kontribusi per tabung sudah di-cache di tube_info).
+    Return (board baru, dh), atau (None, 0) kalau tabung sumber kosong."""
+    i, j = move
+    src_shift = i * TUBE_BITS
+    dst_shift = j * TUBE_BITS
+    src = (board >> src_shift) & TUBE_MASK
+    if src == 0:
+        return None, 0
+    dst = (board >> dst_shift) & TUBE_MASK
+    new_src, new_dst, dh = pour_tubes(src, dst)
+    return board + ((new_src - src) << src_shift) + ((new_dst - dst) << dst_shift), dh
+
+
+def apply_move(board, move):
+    return pour(board, move)[0]
+
+
+
+def canonical_key(board):
+    """Board dengan tabung diurutkan: urutan tabung & tabung kosong mana tidak penting lagi"""
+    values = board_tubes(board)
+    values.sort()
+    return pack_values(values)
+
+
+def _remove_tube(board, pos):
+    shift = pos * TUBE_BITS
+    return (board & ((1 << shift) - 1)) | ((board >> (shift + TUBE_BITS)) << shift)
+
+
+def _insert_tube(board, pos, value):
+    shift = pos * TUBE_BITS
+    return (board & ((1 << shift) - 1)) | (value << shift) | ((board >> shift) << (shift + TUBE_BITS))
+
+
+def replace_tube_pair(key, values, i, j, new_i, new_j):
+    """Board canonical `key` (values = board_tubes(key), sudah urut) dengan tabung i dan j
+    diganti new_i / new_j. Tabung yang tidak disentuh tidak di-decode ulang atau di-sort:
+    2 tabung lama dicabut dan 2 tabung baru disisipkan di posisi urutnya langsung di packed int.
+    Return (key baru, posisi new_i, posisi new_j)."""
+    if i > j:
+        child = _remove_tube(_remove_tube(key, i), j)
+    else:
+        child = _remove_tube(_remove_tube(key, j), i)
+    pos_i = bisect_left(values, new_i)
+    pos_i -= (i < pos_i) + (j < pos_i)
+    child = _insert_tube(child, pos_i, new_i)
+    pos_j = bisect_left(values, new_j)
+    pos_j -= (i < pos_j) + (j < pos_j)
+    if new_i < new_j:
+        pos_j += 1
+    else:
+        pos_i += 1
+    child = _insert_tube(child, pos_j, new_j)
+    return child, pos_i, pos_j
+
+
+def canonical_successors(key, values, moves):
+    """Anak canonical dari board canonical `key`, lewat replace_tube_pair.
+    Return list (move, child_key, dh)."""
+    children = []
+    for mv in moves:
+        i, j = mv
+        new_src, new_dst, dh = pour_tubes(values[i], values[j])
+        child = replace_tube_pair(key, values, i, j, new_src, new_dst)[0]
+        children.append((mv, child, dh))
+    return children
+
+
+def canonical_order(board):
+    """order[k] = index tabung di layar untuk tabung ke-k di canonical_key(board)"""
+    values = board_tubes(board)
+    return sorted(range(len(values)), key=values.__getitem__)
+
+
+def canonical_path_to_screen(start_board, canonical_moves):
+    """Replay langkah canonical dari board asli, petakan tiap langkah ke index layar"""
+    board = start_board
+    screen_moves = []
+    for a, b in canonical_moves:
+        order = canonical_order(board)
+        mv = (order[a], order[b])
+        screen_moves.append(mv)
+        board = apply_move(board, mv)
+    return screen_moves
+
+
+TT_SIZE = 50000  # max entry transposition table per level (LRU)
+
+
+class TranspositionTable:
+    """Tabel bersama untuk semua pencarian hint dalam satu level.
+    canonical key -> (h, dist, move): dist = panjang solusi yang sudah diketahui dari state ini,
+    move = langkah pertamanya (index canonical). g tidak disimpan karena relatif ke root tiap pencarian."""
+
+    def __init__(self, max_size=TT_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def estimate(self, key, h):
+        """h terbaik yang diketahui: dist kalau state ini sudah pernah terpecahkan, selain itu h"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return h
+        return entry[0]
+
+    def store(self, key, h, dist, move):
+        old = self.entries.get(key)
+        if old is not None:
+            if old[1] is not None and (dist is None or old[1] <= dist):
+                self.entries.move_to_end(key)
+                return
+        self.entries[key] = (h, dist, move)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def plan_from(self, key):
+        """Ikuti langkah yang tersimpan sampai goal. None kalau rantainya putus (kena evict)"""
+        moves = []
+        last_dist = None
+        while True:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] is None:
+                # cek goal cuma di ujung rantai, miss biasa cukup 1 lookup
+                return moves if moves and is_goal_state(key) else None
+            if last_dist is not None and entry[1] >= last_dist:
+                return None
+            self.entries.move_to_end(key)
+            last_dist = entry[1]
+            moves.append(entry[2])
+            key = canonical_key(apply_move(key, entry[2]))
+
+    def record_plan(self, key, canonical_moves):
+        remaining = len(canonical_moves)
+        for mv in canonical_moves:
+            self.store(key, remaining, remaining, mv)
+            key = canonical_key(apply_move(key, mv))
+            remaining -= 1
+
+
+def astar_search(start_state, time_limit=0.8, max_nodes=20000, canonical=True, tt=None, prune=True):
+    """A* dari start_state (list-of-lists).
+    Return (path_moves, nodes): path_moves = list (src_idx, dst_idx) pakai index layar,
+    atau None kalau goal tidak ketemu dalam time_limit / max_nodes.
+    tt (TranspositionTable, hanya kalau canonical): solusi yang sudah diketahui dipakai ulang.
+    prune: pakai solver_moves_from, bukan valid_moves_from."""
+    start_board = state_to_key(start_state)
+    start_key = canonical_key(start_board) if canonical else start_board
+    if is_goal_state(start_key):
+        return [], 0
+    if not canonical:
+        tt = None
+    moves_for = _solver_moves if prune else _valid_moves
 
     t0 = time.time()
 
     open_heap = []
-    # heap items: (f, g, key, state, parent_key, move_from_parent)
-    h0 = heuristic(start_state)
-    heapq.heappush(open_heap, (h0, 0, start_key, start_state, None, None))
+    # heap items: (f, g, key, parent_key, move_from_parent, h)
+    # key = packed board (canonical kalau canonical=True), move pakai index di parent_key,
+    # h = heuristic(key) dihitung incremental dari parent
+    h0 = heuristic(start_key)
+    heapq.heappush(open_heap, (h0, 0, start_key, None, None, h0))
 
     came_from = {}
     g_score = {start_key: 0}
@@ -273,7 +1301,7 @@ def astar_find_hint(start_state, time_limit=0.8, max_nodes=20000):
     while open_heap:
         if time.time() - t0 > time_limit:
             break
-        f, g, key, state, parent_key, move = heapq.heappop(open_heap)
+        f, g, key, parent_key, move, h = heapq.heappop(open_heap)
         nodes += 1
         if nodes > max_nodes:
             break
@@ -283,7 +1311,10 @@ def astar_find_hint(start_state, time_limit=0.8, max_nodes=20000):
 
         came_from[key] = (parent_key, move)
 
-        if is_goal_state(state):
+        # dari state yang solusinya sudah ada di tt, tinggal sambung
+        tail = tt.plan_from(key) if tt is not None else None
+
+        if tail is not None or is_goal_state(key):
             # reconstruct path
             path_moves = []
             cur = key
@@ -292,76 +1323,316 @@ def astar_find_hint(start_state, time_limit=0.8, max_nodes=20000):
                 path_moves.append(mv)
                 cur = pk
             path_moves.reverse()
-            if path_moves:
-                return path_moves[0]
-            else:
-                return None
-
-        for mv in valid_moves_from(state):
-            new_state = apply_move(state, mv)
-            if new_state is None:
-                continue
-            nk = state_to_key(new_state)
+            if tail:
+                path_moves.extend(tail)
+            if tt is not None:
+                tt.record_plan(start_key, path_moves)
+            if canonical:
+                path_moves = canonical_path_to_screen(start_board, path_moves)
+            return path_moves, nodes
+
+        values = board_tubes(key)
+        moves = moves_for(values)
+        if canonical:
+            successors = canonical_successors(key, values, moves)
+        else:
+            successors = [(mv,) + pour(key, mv) for mv in moves]
+        for mv, nk, dh in successors:
             tentative_g = g + 1
             if tentative_g < g_score.get(nk, float('inf')):
                 g_score[nk] = tentative_g
-                h = heuristic(new_state)
-                heapq.heappush(open_heap, (tentative_g + h, tentative_g, nk, new_state, key, mv))
+                nh = h + dh
+                est = tt.estimate(nk, nh) if tt is not None else nh
+                heapq.heappush(open_heap, (tentative_g + est, tentative_g, nk, key, mv, nh))
+
+    return None, nodes
+
+
+def idastar_search(start_state, time_limit=0.8, max_nodes=60000, tt_size=4096, tt=None, prune=True):
+    """Iterative-deepening A*: DFS dengan batas f yang naik tiap iterasi.
+    Memori cuma path sekarang + transposition table kecil (max tt_size entry),
+    jadi tidak tumbuh seperti open_heap/came_from di A*. Return sama dengan astar_search.
+    tt: TranspositionTable level (opsional), terpisah dari tabel kecil per iterasi."""
+    start_board = state_to_key(start_state)
+    start_key = canonical_key(start_board)
+    if is_goal_state(start_key):
+        return [], 0
+    moves_for = _solver_moves if prune else _valid_moves
 
-    # Fallback Greedy
+    t0 = time.time()
+    nodes = 0
+    aborted = False
+    path_moves = []
+    on_path = {start_key}
+    iter_tt = {}  # canonical key -> g terkecil di iterasi ini (FIFO eviction kalau penuh)
+
+    def dfs(key, g, h, bound):
+        nonlocal nodes, aborted, next_bound
+        f = g + (tt.estimate(key, h) if tt is not None else h)
+        if f > bound:
+            if f < next_bound:
+                next_bound = f
+            return False
+        if is_goal_state(key):
+            return True
+        if tt is not None:
+            tail = tt.plan_from(key)
+            if tail is not None:
+                path_moves.extend(tail)
+                return True
+        nodes += 1
+        if nodes > max_nodes or time.time() - t0 > time_limit:
+            aborted = True
+            return False
+        values = board_tubes(key)
+        for mv, child, dh in canonical_successors(key, values, moves_for(values)):
+            if child in on_path:
+                continue
+            seen_g = iter_tt.get(child)
+            if seen_g is not None and seen_g <= g + 1:
+                continue
+            if seen_g is None and len(iter_tt) >= tt_size:
+                del iter_tt[next(iter(iter_tt))]
+            iter_tt[child] = g + 1
+            path_moves.append(mv)
+            on_path.add(child)
+            if dfs(child, g + 1, h + dh, bound):
+                return True
+            path_moves.pop()
+            on_path.discard(child)
+            if aborted:
+                return False
+        return False
+
+    h0 = heuristic(start_key)
+    bound = tt.estimate(start_key, h0) if tt is not None else h0
+    while True:
+        next_bound = float('inf')
+        iter_tt.clear()
+        if dfs(start_key, 0, h0, bound):
+            if tt is not None:
+                tt.record_plan(start_key, path_moves)
+            return canonical_path_to_screen(start_board, path_moves), nodes
+        if aborted or next_bound == float('inf'):
+            return None, nodes
+        bound = next_bound
+
+
+# Engine hint per level, dipilih lewat LEVEL_CONFIG[level]["solver"]
+SOLVERS = {
+    "astar": astar_search,
+    "idastar": idastar_search,
+}
+
+
+def solve_plan(state, level, tt=None):
+    config = use_level(level)
+    path_moves, _ = SOLVERS[config.get("solver", "astar")](state, tt=tt)
+    return path_moves
+
+
+# Plan cache: packed board (urutan layar) -> sisa langkah solusi dari A*
+hint_plans = {}
+
+
+def greedy_hint(board):
+    """Fallback kalau A* tidak ketemu solusi: ambil 1 langkah dengan heuristic terkecil"""
     best = None
     best_h = float('inf')
-    for mv in valid_moves_from(start_state):
-        s = apply_move(start_state, mv)
+    h0 = heuristic(board)
+    for mv in valid_moves_from(board):
+        s, dh = pour(board, mv)
         if s is None:
             continue
-        h = heuristic(s)
+        h = h0 + dh
         if h < best_h:
             best_h = h
             best = mv
     return best
 
 
+def advance_hint_plan(prev_key, move, new_state):
+    """Dipanggil setelah pemain menuang. Ikut plan -> sisa plan pindah ke state baru,
+    menyimpang -> entry state lama dibuang"""
+    plan = hint_plans.pop(prev_key, None)
+    if plan and plan[0] == move and len(plan) > 1:
+        hint_plans[state_to_key(new_state)] = plan[1:]
+
+
+# ---------- BACKGROUND HINT WORKER ----------
+# Setelah tiap langkah, A* untuk state baru langsung dijalankan di process lain
+# (bukan thread, biar tidak rebutan GIL dengan loop pygame). Tekan H tinggal ambil hasil.
+
+hint_executor = None
+hint_jobs = {}  # packed board -> Future berisi path_moves (atau None)
+hint_session = 0  # naik tiap setup_level / restart -> TranspositionTable di worker dibuang
+
+# Di worker process: (session, TranspositionTable) untuk level yang sedang dimainkan
+worker_tt = (None, None)
+
+
+def new_hint_session():
+    global hint_session
+    hint_session += 1
+
+
+def solve_plan_job(state, level, session):
+    """Dijalankan di worker process. Worker cuma 1, jadi tabel ini dipakai semua hint di level yang sama"""
+    global worker_tt
+    if worker_tt[0] != session:
+        worker_tt = (session, TranspositionTable())
+        clear_tube_caches()  # tabung level sebelumnya tidak kepakai lagi
+    return solve_plan(state, level, worker_tt[1])
+
+
+def start_hint_job(state):
+    global hint_executor
+    key = state_to_key(state)
+    # job untuk state lama sudah basi: yang belum jalan dibatalkan
+    for job_key in list(hint_jobs):
+        if job_key != key:
+            hint_jobs.pop(job_key).cancel()
+    if key in hint_plans or key in hint_jobs or is_goal_state(key):
+        return
+    if hint_executor is None:
+        hint_executor = ProcessPoolExecutor(max_workers=1)
+    hint_jobs[key] = hint_executor.submit(solve_plan_job, [list(t) for t in state], current_level, hint_session)
+
+
+def collect_hint_jobs():
+    """Dipanggil tiap frame: plan dari job yang sudah selesai masuk ke hint_plans"""
+    for key, future in list(hint_jobs.items()):
+        if not future.done() or future.cancelled():
+            continue
+        try:
+            path_moves = future.result()
+        except Exception as e:
+            print(f"Hint worker error: {e}")
+            path_moves = None
+        if path_moves:
+            hint_plans[key] = path_moves
+            del hint_jobs[key]
+
+
+def poll_hint(state):
+    """Return (move, ready). A* tidak pernah jalan di main thread di sini."""
+    key = state_to_key(state)
+    plan = hint_plans.get(key)
+    if plan:
+        return plan[0], True
+    if is_goal_state(key):
+        return None, True
+    future = hint_jobs.get(key)
+    if future is None:
+        start_hint_job(state)
+        return None, False
+    if not future.done():
+        return None, False
+    # worker selesai tapi A* tidak ketemu solusi
+    return greedy_hint(key), True
+
+
+def stop_hint_jobs():
+    global hint_executor
+    hint_jobs.clear()
+    if hint_executor is not None:
+        hint_executor.shutdown(wait=False, cancel_futures=True)
+        hint_executor = None
+
+
 # ==========================================
 # UI & GAME FUNCTIONS
 # ==========================================
 
 def setup_level(level):
-    global tubes, initial_tubes, game_won, loading, hint_move, hint_used, stars, current_level, player_score, move_count
+    global tubes, initial_tubes, level_solution, game_won, loading, hint_move, hint_used, hint_pending, stars, current_level, player_score, move_count
     player_score = 1000
     move_count = 0
-    loading = True
-    draw_loading(level)
     move_count = 0
     hint_move = None
     
     hint_used = 0 # Reset hint counter ke 0 setiap level baru
+    hint_pending = False
+    hint_plans.clear()
+    new_hint_session()
     
     stars = 0
     current_level = level
-    gen = WaterSortGenerator(level)
-    tubes = gen.generate_with_bfs()
+    use_level(level)
+    entry = level_library.take(level) if level_library is not None else None
+    if entry is None:
+        entry = level_pool.take(level)
+    if entry is None:
+        # pool kosong (miss): generate langsung seperti dulu
+        loading = True
+        draw_loading(level)
+        entry = generate_level_job(level)
+        seen_boards.add(canonical_board_hash(entry[0]))
+    tubes, level_solution = entry
+    if level_solution:
+        # hint pertama langsung dari solusi certified, tanpa search
+        hint_plans[state_to_key(tubes)] = level_solution
 
     initial_tubes = copy.deepcopy(tubes)
     game_won = False
     loading = False
+    renderer.invalidate()  # draw_loading sudah menimpa layar
+    start_hint_job(tubes)
+
+
+TEXT_CACHE_SIZE = 256  # max surface teks yang disimpan (LRU)
+
+
+class TextCache:
+    """Surface hasil font.render per (font, teks, warna): teks dirasterisasi sekali, selanjutnya
+    cuma blit. LRU supaya teks yang nilainya terus berubah (skor, move) tidak menumpuk."""
+
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def render(self, surface_font, text, color):
+        key = (surface_font, text, color)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = surface_font.render(text, True, color)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return surface
+
+
+text_cache = TextCache()
+
+
+def render_text(surface_font, text, color):
+    return text_cache.render(surface_font, text, color)
 
 
 def draw_loading(level):
     screen.fill((20, 20, 20))
-    text = font.render(f'GENERATING LEVEL {level}... (Please Wait)', True, 'white')
+    text = render_text(font, f'GENERATING LEVEL {level}... (Please Wait)', 'white')
     screen.blit(text, (WIDTH // 2 - 180, HEIGHT // 2))
     pygame.display.flip()
 
 
 def draw_start_menu():
     screen.fill((20, 20, 30))
-    title = large_font.render('WATER SORT PUZZLE', True, (255, 255, 255))
+    title = render_text(large_font, 'WATER SORT PUZZLE', (255, 255, 255))
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, HEIGHT // 2 - 120))
 
     start_rect = pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 - 20, 200, 60)
     pygame.draw.rect(screen, (40, 120, 200), start_rect, border_radius=8)
-    start_text = font.render('START', True, (255, 255, 255))
+    start_text = render_text(font, 'START', (255, 255, 255))
     screen.blit(start_text, (start_rect.x + start_rect.width // 2 - start_text.get_width() // 2,
                              start_rect.y + start_rect.height // 2 - start_text.get_height() // 2))
     return start_rect
@@ -369,138 +1640,328 @@ def draw_start_menu():
 
 def draw_level_select():
     screen.fill((18, 18, 18))
-    title = large_font.render('PILIH LEVEL', True, (255, 255, 255))
+    title = render_text(large_font, 'PILIH LEVEL', (255, 255, 255))
     screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 80))
 
     btns = []
     btn_width = 100
     btn_height = 70
     gap = 20
-    total_w = 5 * btn_width + 4 * gap
+    per_row = 5
+    levels = sorted(LEVEL_CONFIG)
+    rows = (len(levels) + per_row - 1) // per_row
+    total_w = per_row * btn_width + (per_row - 1) * gap
     start_x = WIDTH // 2 - total_w // 2
-    y = HEIGHT // 2 - btn_height // 2
+    start_y = HEIGHT // 2 - (rows * btn_height + (rows - 1) * gap) // 2
 
-    for i in range(5):
-        r = pygame.Rect(start_x + i * (btn_width + gap), y, btn_width, btn_height)
+    for i, level in enumerate(levels):
+        row, col = divmod(i, per_row)
+        r = pygame.Rect(start_x + col * (btn_width + gap), start_y + row * (btn_height + gap), btn_width, btn_height)
         pygame.draw.rect(screen, (50, 150, 200), r, border_radius=8)
-        num_text = font.render(str(i + 1), True, (255, 255, 255))
+        num_text = render_text(font, str(level), (255, 255, 255))
         screen.blit(num_text, (r.x + r.width // 2 - num_text.get_width() // 2,
                                r.y + r.height // 2 - num_text.get_height() // 2))
         btns.append(r)
 
     back_r = pygame.Rect(20, 20, 100, 40)
     pygame.draw.rect(screen, (100, 100, 100), back_r, border_radius=6)
-    back_t = font.render('BACK', True, (255, 255, 255))
+    back_t = render_text(font, 'BACK', (255, 255, 255))
     screen.blit(back_t, (back_r.x + 10, back_r.y + 8))
     btns.append(back_r)
 
     return btns
 
 
+def tube_layout(num_tubes):
+    """(tube_width, tube_height, gap, row_height, per_row). Sampai 9 tabung ukurannya tetap
+    (70 x 250), lebih dari itu tabung dipersempit, lebih dari 12 dibagi 2 baris."""
+    if num_tubes * 95 - 25 <= WIDTH - 40:
+        return 70, 250, 25, 0, num_tubes
+    rows = 1 if num_tubes <= 12 else 2
+    per_row = (num_tubes + rows - 1) // rows
+    slot = (WIDTH - 40) // per_row
+    tube_height = 250 if rows == 1 else 190
+    return int(slot * 0.74), tube_height, slot - int(slot * 0.74), tube_height + 45, per_row
+
+
+class DirtyRenderer:
+    """Retained mode: simpan signature tiap elemen layar (tabung, teks header, overlay) dari frame
+    sebelumnya, dan gambar ulang cuma elemen yang signature-nya berubah. Rect yang digambar
+    dikumpulkan sampai flush() untuk pygame.display.update(rects)."""
+
+    def __init__(self):
+        self.items = {}  # key -> (signature, rect terakhir)
+        self.full = True
+        self.dirty = []
+        self.redrawn_pixels = 0  # piksel yang digambar ulang di frame terakhir (sesudah flush)
+        self.total_pixels = 0
+        self.frames = 0
+
+    def invalidate(self):
+        """Frame berikutnya gambar ulang semua (layar dipakai tampilan lain / layout berubah)"""
+        self.full = True
+
+    def changed(self, key, signature):
+        """True kalau elemen key harus digambar ulang (signature beda atau sedang full redraw)"""
+        old = self.items.get(key)
+        if self.full or old is None or old[0] != signature:
+            self.items[key] = (signature, None if old is None else old[1])
+            return True
+        return False
+
+    def drawn(self, key, rect):
+        """Catat area yang baru digambar untuk key; return area lama + baru (yang perlu di-update)"""
+        signature, old_rect = self.items[key]
+        rect = pygame.Rect(rect)
+        self.items[key] = (signature, rect)
+        area = rect.union(old_rect) if old_rect else rect
+        if not self.full:  # full redraw sudah mencakup seluruh layar
+            self.dirty.append(area)
+        return area
+
+    def begin_full(self):
+        screen.fill(BG_COLOR)
+        self.items.clear()
+        self.dirty = [screen.get_rect()]
+
+    def end_frame(self):
+        self.full = False
+
+    def flush(self):
+        """Rect yang berubah sejak flush terakhir (untuk display.update) + update counter piksel"""
+        dirty, self.dirty = self.dirty, []
+        self.redrawn_pixels = sum(r.width * r.height for r in dirty)
+        self.total_pixels += self.redrawn_pixels
+        self.frames += 1
+        return dirty
+
+
+BG_COLOR = (30, 30, 30)
+renderer = DirtyRenderer()
+
+
+def tube_slot(i, num_tubes):
+    """(x, y dasar, tube_width, tube_height, area kolom) tabung ke-i: area kolom mencakup
+    tabung yang terangkat karena dipilih / hint"""
+    tube_width, tube_height, gap, row_height, per_row = tube_layout(num_tubes)
+    start_y = 200 if per_row == num_tubes else 110
+    row, col = divmod(i, per_row)
+    in_row = min(per_row, num_tubes - row * per_row)
+    total_width = (in_row * tube_width) + ((in_row - 1) * gap)
+    x = (WIDTH - total_width) // 2 + (col * (tube_width + gap))
+    y = start_y + row * row_height
+    return x, y, tube_width, tube_height, pygame.Rect(x, y - 30, tube_width, tube_height + 30)
+
+
+def draw_text_item(key, surface_font, text, color, pos):
+    """Teks header: digambar ulang cuma kalau isinya berubah"""
+    if renderer.changed(key, (text, color, pos)):
+        old = renderer.items[key][1]
+        if old:
+            screen.fill(BG_COLOR, old)
+        rendered = render_text(surface_font, text, color)
+        screen.blit(rendered, pos)
+        renderer.drawn(key, rendered.get_rect(topleft=pos))
+
+
+# Outline tabung per state: (border_color, thickness)
+TUBE_STYLES = {
+    "normal": ((200, 200, 200), 3),
+    "selected": ((255, 255, 0), 5),
+    "hint_src": ((0, 255, 255), 6),   # Cyan for source
+    "hint_dst": ((0, 200, 0), 6),     # Green for dest
+}
+
+
+ATLAS_KEY = (255, 0, 254)  # colorkey atlas, tidak dipakai warna air / outline mana pun
+
+
+class TubeAtlas:
+    """Sprite untuk satu ukuran tabung, digambar sekali ke satu surface: segmen air tiap warna
+    COLOR_MAP, outline tiap TUBE_STYLES, dan tile background kolom (untuk menghapus tabung lama).
+    Surface colorkey + RLEACCEL: bagian transparan di-skip saat blit, lebih cepat dari per-pixel
+    alpha, dan blit tile jauh lebih cepat dari screen.fill area yang sama."""
+
+    def __init__(self, tube_width, tube_height, capacity):
+        seg_width, seg_height = int(tube_width - 10), int(tube_height / capacity)
+        colors = list(COLOR_MAP) + [None]  # None = warna tidak dikenal (putih)
+        width = max(len(colors) * seg_width, len(TUBE_STYLES) * tube_width)
+        self.surface = pygame.Surface((width, seg_height + 2 * tube_height + 30)).convert()
+        self.surface.fill(ATLAS_KEY)
+        self.segments = {}
+        for n, code in enumerate(colors):
+            area = pygame.Rect(n * seg_width, 0, seg_width, seg_height)
+            pygame.draw.rect(self.surface, COLOR_MAP.get(code, (255, 255, 255)), area, 0, 8)
+            self.segments[code] = area
+        self.outlines = {}
+        for n, (style, (border_color, thickness)) in enumerate(TUBE_STYLES.items()):
+            area = pygame.Rect(n * tube_width, seg_height, tube_width, tube_height)
+            pygame.draw.rect(self.surface, border_color, area, thickness, 8)
+            self.outlines[style] = area
+        self.column = pygame.Rect(0, seg_height + tube_height, tube_width, tube_height + 30)
+        self.surface.fill(BG_COLOR, self.column)
+        self.surface.set_colorkey(ATLAS_KEY, pygame.RLEACCEL)
+
+    def segment(self, color_code):
+        return self.segments.get(color_code, self.segments[None])
+
+
+tube_atlases = {}  # (tube_width, tube_height, capacity) -> TubeAtlas
+
+
+def tube_atlas(tube_width, tube_height):
+    key = (tube_width, tube_height, BOTOL_CAPACITY)
+    atlas = tube_atlases.get(key)
+    if atlas is None:
+        atlas = tube_atlases[key] = TubeAtlas(tube_width, tube_height, BOTOL_CAPACITY)
+    return atlas
+
+
+def draw_tube(i, num_tubes, tube, style, lift):
+    x, y, tube_width, tube_height, column = tube_slot(i, num_tubes)
+    y -= lift
+    atlas = tube_atlas(tube_width, tube_height)
+
+    # 0. Hapus kolom, 1. Gambar Air, 2. Gambar Tabung: semua sprite dari atlas, satu panggilan blits
+    h_unit = tube_height / BOTOL_CAPACITY
+    sprites = [(atlas.surface, column, atlas.column)]
+    sprites += [(atlas.surface, (int(x + 5), int((y + tube_height) - ((idx + 1) * h_unit))), atlas.segment(color_code))
+                for idx, color_code in enumerate(tube)]
+    sprites.append((atlas.surface, (int(x), int(y)), atlas.outlines[style]))
+    screen.blits(sprites, doreturn=False)
+    return column
+
+
+def tube_style(i):
+    """(style di TUBE_STYLES, lift) tabung ke-i sesuai pilihan & hint"""
+    style = "normal"
+    lift = 0
+    if selected_tube == i:
+        style = "selected"
+        lift += 20
+
+    # VISUALISASI HINT
+    if hint_move is not None:
+        try:
+            src_idx, dst_idx = hint_move
+            if i == src_idx:
+                style = "hint_src"
+                lift += 10
+            if i == dst_idx:
+                style = "hint_dst"
+        except Exception:
+            pass
+    return style, lift
+
+
 def draw_game_interface():
+    """Gambar layar main (retained mode lewat renderer), return rect tabung untuk klik"""
     global hint_move, selected_tube, stars
-    screen.fill((30, 30, 30))
+    num_tubes = len(tubes)
+    styles = [tube_style(i) for i in range(num_tubes)]
+    tube_sigs = [(tuple(tubes[i]),) + styles[i] for i in range(num_tubes)]
+
+    # layout / overlay berubah -> gambar ulang semua. Selama overlay menang tampil, isi tabung
+    # ikut signature scene supaya overlay tetap di atas.
+    scene = (current_level, num_tubes, loading, game_won,
+             (tuple(tube_sigs), player_score, move_count, hint_used, stars) if game_won else None)
+    if renderer.changed("scene", scene):
+        renderer.full = True
+        renderer.begin_full()
+        renderer.items["scene"] = (scene, None)
 
     # Header
-    level_text = font.render(f'LEVEL: {current_level}', True, 'white')
-    screen.blit(level_text, (20, 20))
-    hint_text = font.render('R: Restart | SPACE: Skip Level (Cheat) | H: Hint (A*)', True, 'gray')
-    screen.blit(hint_text, (WIDTH - 520, 20))
+    draw_text_item("level", font, f'LEVEL: {current_level}', 'white', (20, 20))
+    draw_text_item("help", font, 'R: Restart | SPACE: Skip Level (Cheat) | H: Hint (A*)', 'gray', (WIDTH - 520, 20))
 
     if loading:
+        renderer.end_frame()
         return []
 
-    num_tubes = len(tubes)
-    tube_width = 70
-    tube_height = 250
-    gap = 25
-
-    total_width = (num_tubes * tube_width) + ((num_tubes - 1) * gap)
-    start_x = (WIDTH - total_width) // 2
-    start_y = 200
-
     rects = []
-
     for i in range(num_tubes):
-        x = start_x + (i * (tube_width + gap))
-        y = start_y
-
-        border_color = (200, 200, 200)
-        thickness = 3
-        if selected_tube == i:
-            border_color = (255, 255, 0)
-            thickness = 5
-            y -= 20
-
-        # VISUALISASI HINT
-        if hint_move is not None:
-            try:
-                src_idx, dst_idx = hint_move
-                if i == src_idx:
-                    border_color = (0, 255, 255)  # Cyan for source
-                    thickness = 6
-                    y -= 10
-                if i == dst_idx:
-                    border_color = (0, 200, 0)    # Green for dest
-                    thickness = 6
-            except Exception:
-                pass
-
-        # 1. Gambar Air
-        for idx, color_code in enumerate(tubes[i]):
-            color = COLOR_MAP.get(color_code, (255, 255, 255))
-            h_unit = tube_height / BOTOL_CAPACITY
-            water_y = (y + tube_height) - ((idx + 1) * h_unit)
-            pygame.draw.rect(screen, color, [int(x + 5), int(water_y), int(tube_width - 10), int(h_unit)], 0, 8)
-
-        # 2. Gambar Tabung
-        tube_rect = pygame.Rect(int(x), int(y), tube_width, tube_height)
-        pygame.draw.rect(screen, border_color, tube_rect, thickness, 8)
-        rects.append(tube_rect)
-
-    if game_won:
-        s = pygame.Surface((WIDTH, HEIGHT))
-        s.set_alpha(150)
-        s.fill((0, 0, 0))
-        screen.blit(s, (0, 0))
-
-        msg = large_font.render('LEVEL COMPLETED!', True, (0, 255, 0))
-        sub_msg = font.render('Press ENTER for Next Level', True, 'white')
-        screen.blit(msg, (WIDTH // 2 - 180, HEIGHT // 2 - 50))
-        screen.blit(sub_msg, (WIDTH // 2 - 140, HEIGHT // 2 + 10))
-
-        hint_out = font.render(f"HINT USED: {hint_used}", True, "white")
-        screen.blit(hint_out, (395, 390))
-        
-        hint_out = font.render(f"MOVE: {move_count}", True, "white")
-        screen.blit(hint_out, (410, 420))
-
-        score_text = font.render(f"SCORE: {player_score}", True, "white")
-        screen.blit(score_text, (400, 350))
-
-        if stars > 0:
-            def draw_star(surface, x, y, size, color):
-                pts = [
-                    (int(x), int(y - size)),
-                    (int(x + size * 0.2245), int(y - size * 0.3090)),
-                    (int(x + size), int(y - size * 0.3090)),
-                    (int(x + size * 0.3633), int(y + size * 0.1180)),
-                    (int(x + size * 0.5878), int(y + size)),
-                    (int(x), int(y + size * 0.3819)),
-                    (int(x - size * 0.5878), int(y + size)),
-                    (int(x - size * 0.3633), int(y + size * 0.1180)),
-                    (int(x - size), int(y - size * 0.3090)),
-                    (int(x - size * 0.2245), int(y - size * 0.3090))
-                ]
-                pygame.draw.polygon(surface, color, pts)
-
-            total_width = (stars - 1) * 60
-            for s_idx in range(stars):
-                draw_star(screen, WIDTH // 2 - (total_width // 2) + s_idx * 60, HEIGHT // 2 - 100, 30, (255, 215, 0))
+        x, y, tube_width, tube_height, _ = tube_slot(i, num_tubes)
+        if renderer.changed(("tube", i), tube_sigs[i]):
+            renderer.drawn(("tube", i), draw_tube(i, num_tubes, tubes[i], *styles[i]))
+        rects.append(pygame.Rect(int(x), int(y - styles[i][1]), tube_width, tube_height))
+
+    if game_won and renderer.full:
+        # overlay cuma digambar saat full redraw (signature scene ikut berubah kalau isinya berubah)
+        draw_win_overlay()
 
+    renderer.end_frame()
     return rects
 
 
+STAR_COLOR = (255, 215, 0)
+
+
+def star_sprite(size, color):
+    """Bintang (polygon 10 titik) di surface transparan (2 * size + 1) persegi, pusat di (size, size)"""
+    sprite = pygame.Surface((2 * size + 1, 2 * size + 1), pygame.SRCALPHA)
+    x = y = size
+    pts = [
+        (int(x), int(y - size)),
+        (int(x + size * 0.2245), int(y - size * 0.3090)),
+        (int(x + size), int(y - size * 0.3090)),
+        (int(x + size * 0.3633), int(y + size * 0.1180)),
+        (int(x + size * 0.5878), int(y + size)),
+        (int(x), int(y + size * 0.3819)),
+        (int(x - size * 0.5878), int(y + size)),
+        (int(x - size * 0.3633), int(y + size * 0.1180)),
+        (int(x - size), int(y - size * 0.3090)),
+        (int(x - size * 0.2245), int(y - size * 0.3090))
+    ]
+    pygame.draw.polygon(sprite, color, pts)
+    return sprite
+
+
+class WinOverlay:
+    """Layar menang (layar digelapkan + bintang + teks) disusun sekali ke satu surface full screen,
+    tiap gambar cukup satu blit. Surface, sprite bintang dan isinya dipakai ulang, disusun ulang
+    cuma kalau bintang / skor / move / hint berubah. Teks di-blend di atas hitam, jadi isinya
+    premultiplied alpha: di-blit dengan BLEND_PREMULTIPLIED supaya tepi teks sama dengan blit
+    satu per satu di atas layar yang digelapkan."""
+
+    def __init__(self):
+        self.surface = None
+        self.star = None
+        self.key = None
+
+    def compose(self, stars, score, moves, hints):
+        if self.surface is None:
+            self.surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA).convert_alpha()
+            self.star = star_sprite(30, STAR_COLOR)
+        key = (stars, score, moves, hints)
+        if key == self.key:
+            return self.surface
+        self.key = key
+        self.surface.fill((0, 0, 0, 150))
+
+        texts = [
+            (render_text(large_font, 'LEVEL COMPLETED!', (0, 255, 0)), (WIDTH // 2 - 180, HEIGHT // 2 - 50)),
+            (render_text(font, 'Press ENTER for Next Level', 'white'), (WIDTH // 2 - 140, HEIGHT // 2 + 10)),
+            (render_text(font, f"HINT USED: {hints}", "white"), (395, 390)),
+            (render_text(font, f"MOVE: {moves}", "white"), (410, 420)),
+            (render_text(font, f"SCORE: {score}", "white"), (400, 350)),
+        ]
+        for text, pos in texts:
+            self.surface.blit(text, pos)
+
+        total_width = (stars - 1) * 60
+        for s_idx in range(stars):
+            x = WIDTH // 2 - (total_width // 2) + s_idx * 60
+            self.surface.blit(self.star, (x - 30, HEIGHT // 2 - 100 - 30))
+        return self.surface
+
+
+win_overlay = WinOverlay()
+
+
+def draw_win_overlay():
+    overlay = win_overlay.compose(stars, player_score, move_count, hint_used)
+    screen.blit(overlay, (0, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+
 
 def check_victory():
     for tube in tubes:
@@ -522,11 +1983,11 @@ def handle_move(src_idx, dst_idx):
     src = tubes[src_idx]
     dst = tubes[dst_idx]
 
-    if len(src) == 0: return 
-    if len(dst) >= BOTOL_CAPACITY: return 
+    if len(src) == 0: return False
+    if len(dst) >= BOTOL_CAPACITY: return False
 
     src_color = src[-1] 
-    if len(dst) > 0 and dst[-1] != src_color: return 
+    if len(dst) > 0 and dst[-1] != src_color: return False
 
     amount_to_move = 0
     for i in range(len(src)-1, -1, -1):
@@ -541,38 +2002,95 @@ def handle_move(src_idx, dst_idx):
 
     player_score -= 10     
     move_count += 1       
+    return True
 
 
 # ==========================================
 # 3. MAIN LOOP
 # ==========================================
+# Tidak ada animasi: kalau pemain diam, loop tidur di event.wait (CPU ~0).
+# Satu-satunya yang perlu dicek tanpa input adalah hint yang sudah diminta ke worker.
+def wait_events():
+    """Event untuk iterasi berikutnya. Blok sampai ada input, atau paling lama 1 frame
+    selama hint ditunggu dari worker (jawabannya muncul secepat waktu tick FPS dulu)."""
+    timeout = 1000 // FPS if ui_state == 'playing' and hint_pending else 0  # 0 = tanpa batas
+    event = pygame.event.wait(timeout)
+    events = pygame.event.get()
+    if event.type != pygame.NOEVENT:
+        events.insert(0, event)
+    return events
+
 
 def main():
-    global current_level, selected_tube, tubes, game_won, hint_move, hint_used, stars, ui_state, player_score, move_count
+    global current_level, selected_tube, tubes, game_won, hint_move, hint_used, hint_pending, stars, ui_state, player_score, move_count, screen
+    global level_library, level_pool
+
+    screen = pygame.display.set_mode([WIDTH, HEIGHT])
+    pygame.display.set_caption('Water Sort Puzzle - Final BFS Project (Fixed Hint)')
+
+    # Level dari pack di disk kalau ada, pool worker cuma untuk level yang tidak ada di pack
+    level_library = open_level_library()
+    if level_library is not None:
+        level_pool = LevelPool(levels=[l for l in LEVEL_CONFIG if level_library.count(l) == 0])
+
+    # gerakan mouse tidak dipakai, jangan sampai membangunkan loop
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
 
     run = True
     ui_state = 'menu'
+    shown = None  # layar menu / level select yang sedang tampil, digambar ulang hanya kalau berubah
 
     while run:
-        timer.tick(FPS)
+        level_pool.refill()
 
         if ui_state == 'menu':
-            start_btn = draw_start_menu()
+            if shown != 'menu':
+                start_btn = draw_start_menu()
+                pygame.display.flip()
+                renderer.invalidate()  # layar main harus digambar ulang semua nanti
+                shown = 'menu'
             level_btns = []
             game_rects = []
         elif ui_state == 'level_select':
-            level_btns = draw_level_select()
+            if shown != 'level_select':
+                level_btns = draw_level_select()
+                pygame.display.flip()
+                renderer.invalidate()
+                shown = 'level_select'
             start_btn = None
             game_rects = []
         else:  # playing
+            # hasil worker hint masuk ke cache, hint yang sudah diminta dijawab kalau siap
+            collect_hint_jobs()
+            if hint_pending and not game_won and not loading:
+                move, ready = poll_hint(tubes)
+                if ready:
+                    hint_pending = False
+                    hint_move = move
+                    if hint_move is None:
+                        print("Hint: tidak ditemukan atau tabung sudah rapi.")
+                    else:
+                        print(f"Hint: tuang dari {hint_move[0]} ke {hint_move[1]}")
+                        player_score -= 100    # kurangi skor 100
+                        hint_used += 1
+
             game_rects = draw_game_interface()
+            dirty = renderer.flush()
+            if dirty:
+                pygame.display.update(dirty)
+            shown = 'playing'
             start_btn = None
             level_btns = []
 
-        for event in pygame.event.get():
+        for event in wait_events():
             if event.type == pygame.QUIT:
                 run = False
 
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # isi window hilang (di-restore / tertutup window lain): gambar ulang semua
+                shown = None
+                renderer.invalidate()
+
             if ui_state == 'menu':
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     if start_btn and start_btn.collidepoint(event.pos):
@@ -582,7 +2100,7 @@ def main():
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     for idx, r in enumerate(level_btns[:-1]): 
                         if r.collidepoint(event.pos):
-                            chosen = idx + 1
+                            chosen = sorted(LEVEL_CONFIG)[idx]
                             setup_level(chosen)
                             ui_state = 'playing'
                             break
@@ -597,7 +2115,12 @@ def main():
                         game_won = False
                         hint_move = None
                         hint_used = 0 # Reset hint
+                        hint_pending = False
                         stars = 0
+                        new_hint_session()
+                        if level_solution:
+                            hint_plans[state_to_key(tubes)] = level_solution
+                        start_hint_job(tubes)
                     
                     if event.key == pygame.K_ESCAPE:
                         if ui_state == "playing":
@@ -610,7 +2133,7 @@ def main():
                         game_won = True
 
                     if event.key == pygame.K_RETURN and game_won:  # Next Level
-                        if current_level < 5:
+                        if current_level < max(LEVEL_CONFIG):
                             setup_level(current_level + 1)
                         else:
                             print("TAMAT!")
@@ -627,16 +2150,9 @@ def main():
                         elif player_score < 100:
                             print(f"GAGAL: Score kamu {player_score}. Butuh 100 untuk Hint!")
                         
-                        # 3. selain 2 itu, jalankan hint
+                        # 3. selain 2 itu, minta hint (dijawab di awal frame begitu worker selesai)
                         else:
-                            hint_move = astar_find_hint(tubes)
-                            
-                            if hint_move is None:
-                                print("Hint: tidak ditemukan atau tabung sudah rapi.")
-                            else:
-                                print(f"Hint: tuang dari {hint_move[0]} ke {hint_move[1]}")
-                                player_score -= 100    # kurangi skor 100
-                                hint_used += 1               
+                            hint_pending = True
 
                 if event.type == pygame.MOUSEBUTTONDOWN and not game_won:
                     pos = event.pos
@@ -654,7 +2170,12 @@ def main():
                             if selected_tube == clicked_idx:
                                 selected_tube = None
                             else:
-                                handle_move(selected_tube, clicked_idx)
+                                prev_key = state_to_key(tubes)
+                                if handle_move(selected_tube, clicked_idx):
+                                    advance_hint_plan(prev_key, (selected_tube, clicked_idx), tubes)
+                                    start_hint_job(tubes)
+                                    # hint yang diminta untuk board lama batal (skor tidak dipotong)
+                                    hint_pending = False
                                 selected_tube = None
                                 hint_move = None 
                                 
@@ -670,8 +2191,11 @@ def main():
                                         stars = 1
                                     print(f"Level complete dengan {stars} bintang!")
 
-        pygame.display.flip()
-
+    stop_hint_jobs()
+    level_pool.shutdown()
+    print(f"Level pool: {level_pool.stats()}")
+    if level_library is not None:
+        level_library.close()
     pygame.quit()
 
 
@@ -0,0 +1,957 @@
+import contextlib
+import copy
+import heapq
+import io
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import puzzle_last as game
+
+# ==========================================
+# TOOLS: BENCHMARK & UTILITAS DEVELOPER
+# Jalankan: python puzzle_tools.py <command>
+# ==========================================
+
+
+def quiet_generate(level, seed=None):
+    """Generate level tanpa print 'BFS Generating ...'. Tanpa seed, seed diambil dari random global
+    supaya benchmark yang memanggil random.seed(...) tetap reproducible."""
+    if seed is None:
+        seed = random.getrandbits(32)
+    game.use_level(level)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return game.WaterSortGenerator(level, seed).generate_with_bfs()
+
+
+def sample_states(level, boards=20, walk=100):
+    """Ambil banyak state dari random walk (langkah legal) mulai dari level hasil generator"""
+    states = []
+    for _ in range(boards):
+        board = game.state_to_key(quiet_generate(level))
+        for _ in range(walk):
+            if game.is_goal_state(board):
+                break
+            states.append(game.key_to_state(board))
+            moves = game.valid_moves_from(board)
+            if not moves:
+                break
+            board = game.apply_move(board, random.choice(moves))
+    return states
+
+
+# ---------- Referensi solver lama (tuple keys + list-of-lists) ----------
+
+def legacy_state_to_key(state):
+    return tuple(tuple(t) for t in state)
+
+
+def legacy_is_goal_state(state):
+    for tube in state:
+        if len(tube) == 0:
+            continue
+        if len(tube) < game.BOTOL_CAPACITY:
+            return False
+        first = tube[0]
+        for c in tube:
+            if c != first:
+                return False
+    return True
+
+
+def legacy_heuristic(state):
+    h = 0
+    for tube in state:
+        if not tube:
+            continue
+        for i in range(len(tube) - 1):
+            if tube[i] != tube[i + 1]:
+                h += 1
+        if len(tube) < game.BOTOL_CAPACITY:
+            h += (game.BOTOL_CAPACITY - len(tube))
+    return h
+
+
+def legacy_valid_moves_from(state):
+    moves = []
+    n = len(state)
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            src = state[i]
+            dst = state[j]
+            if len(src) == 0 or len(dst) >= game.BOTOL_CAPACITY:
+                continue
+            if len(dst) > 0 and dst[-1] != src[-1]:
+                continue
+            moves.append((i, j))
+    return moves
+
+
+def legacy_apply_move(state, move):
+    i, j = move
+    new_state = [list(t) for t in state]
+    if len(new_state[i]) == 0:
+        return None
+    src_color = new_state[i][-1]
+    amount = 0
+    for k in range(len(new_state[i]) - 1, -1, -1):
+        if new_state[i][k] == src_color:
+            amount += 1
+        else:
+            break
+    space = game.BOTOL_CAPACITY - len(new_state[j])
+    for _ in range(min(amount, space)):
+        new_state[j].append(new_state[i].pop())
+    return new_state
+
+
+def legacy_astar_nodes(start_state, time_limit=0.8, max_nodes=20000):
+    """A* lama, tapi return jumlah node yang di-expand (bukan hint)"""
+    start_key = legacy_state_to_key(start_state)
+    t0 = time.time()
+    open_heap = [(legacy_heuristic(start_state), 0, start_key, start_state, None, None)]
+    came_from = {}
+    g_score = {start_key: 0}
+    nodes = 0
+    while open_heap:
+        if time.time() - t0 > time_limit:
+            break
+        f, g, key, state, parent_key, move = heapq.heappop(open_heap)
+        nodes += 1
+        if nodes > max_nodes:
+            break
+        if key in came_from:
+            continue
+        came_from[key] = (parent_key, move)
+        if legacy_is_goal_state(state):
+            break
+        for mv in legacy_valid_moves_from(state):
+            new_state = legacy_apply_move(state, mv)
+            nk = legacy_state_to_key(new_state)
+            if g + 1 < g_score.get(nk, float('inf')):
+                g_score[nk] = g + 1
+                heapq.heappush(open_heap, (g + 1 + legacy_heuristic(new_state), g + 1, nk, new_state, key, mv))
+    return nodes
+
+
+def packed_astar_nodes(start_state, time_limit=0.8, max_nodes=20000):
+    """Loop A* yang sama dengan astar_search, versi packed int, return jumlah node"""
+    start_key = game.state_to_key(start_state)
+    t0 = time.time()
+    open_heap = [(game.heuristic(start_key), 0, start_key, None, None)]
+    came_from = {}
+    g_score = {start_key: 0}
+    nodes = 0
+    while open_heap:
+        if time.time() - t0 > time_limit:
+            break
+        f, g, key, parent_key, move = heapq.heappop(open_heap)
+        nodes += 1
+        if nodes > max_nodes:
+            break
+        if key in came_from:
+            continue
+        came_from[key] = (parent_key, move)
+        if game.is_goal_state(key):
+            break
+        for mv in game.valid_moves_from(key):
+            nk = game.apply_move(key, mv)
+            if g + 1 < g_score.get(nk, float('inf')):
+                g_score[nk] = g + 1
+                heapq.heappush(open_heap, (g + 1 + game.heuristic(nk), g + 1, nk, key, mv))
+    return nodes
+
+
+# ---------- Referensi generator lama (deepcopy tiap langkah) ----------
+
+def legacy_generate_with_bfs(gen):
+    goal_state = gen.create_goal_state()
+    queue = [(goal_state, 0, None)]
+    final_state = goal_state
+    visited_count = 0
+    while queue:
+        current_state, depth, last_move = queue.pop(0)
+        visited_count += 1
+        if depth > 0:
+            final_state = current_state
+        if depth >= gen.target_depth or visited_count > 5000:
+            return current_state
+        potential_moves = []
+        for i in range(len(current_state)):
+            for j in range(len(current_state)):
+                if i == j:
+                    continue
+                src, dst = current_state[i], current_state[j]
+                if len(src) > 0 and len(dst) < game.BOTOL_CAPACITY:
+                    if last_move and last_move == (j, i):
+                        continue
+                    score = gen.get_chaos_score(src, dst)
+                    if score > 0:
+                        potential_moves.append((score, i, j))
+        if not potential_moves:
+            for i in range(len(current_state)):
+                for j in range(len(current_state)):
+                    if i == j:
+                        continue
+                    if len(current_state[i]) > 0 and len(current_state[j]) < game.BOTOL_CAPACITY:
+                        if last_move and last_move == (j, i):
+                            continue
+                        potential_moves.append((1, i, j))
+        if not potential_moves:
+            continue
+        gen.rng.shuffle(potential_moves)
+        potential_moves.sort(key=lambda x: x[0], reverse=True)
+        score, src_idx, dst_idx = potential_moves[0]
+        new_state = copy.deepcopy(current_state)
+        new_state[dst_idx].append(new_state[src_idx].pop())
+        queue.append((new_state, depth + 1, (src_idx, dst_idx)))
+    return final_state
+
+
+# BFS dua arah cuma untuk pembanding di bench-memory: mundur dari goal, frontier-nya bercabang
+# jauh lebih banyak daripada A* / IDA* yang dipandu heuristic, jadi tidak dipakai untuk hint.
+def canonical_predecessors(key, values):
+    """Kebalikan canonical_successors: list (pred_key, move) dengan move = langkah maju
+    di index canonical pred yang menghasilkan `key`."""
+    preds = []
+    seen_src = set()
+    for i, src in enumerate(values):
+        if game.tube_info(src)[0] >= game.BOTOL_CAPACITY or src in seen_src:
+            continue
+        seen_src.add(src)
+        seen_dst = set()
+        for j, dst in enumerate(values):
+            if i == j or dst == 0 or dst in seen_dst:
+                continue
+            seen_dst.add(dst)
+            for pre_src, pre_dst in game.unpour_tubes(src, dst):
+                pred, pos_src, pos_dst = game.replace_tube_pair(key, values, i, j, pre_src, pre_dst)
+                preds.append((pred, (pos_src, pos_dst)))
+    return preds
+
+
+def goal_key_for(board):
+    """Goal canonical untuk board ini: tiap warna jadi tabung penuh, sisanya kosong.
+    Karena canonical, semua susunan tabung rapi = goal yang sama. None kalau tidak mungkin."""
+    values = game.board_tubes(board)
+    counts = {}
+    for value in values:
+        for color in game.unpack_tube(value):
+            counts[color] = counts.get(color, 0) + 1
+    goal = []
+    for color, count in counts.items():
+        if count % game.BOTOL_CAPACITY:
+            return None
+        goal += [color * game.RUN_FILL[game.BOTOL_CAPACITY]] * (count // game.BOTOL_CAPACITY)
+    if len(goal) > len(values):
+        return None
+    state = [game.unpack_tube(v) for v in goal] + [[]] * (len(values) - len(goal))
+    return game.canonical_key(game.state_to_key(state))
+
+
+def bidirectional_search(start_state, time_limit=0.8, max_nodes=20000, tt=None, prune=True):
+    """BFS dua arah: maju dari start_state, mundur dari goal_key_for(start) pakai
+    kebalikan tuang yang persis (canonical_predecessors), ketemu di tengah.
+    Tiap langkah, sisi dengan layer lebih kecil yang di-expand. Return sama dengan astar_search."""
+    start_board = game.state_to_key(start_state)
+    start_key = game.canonical_key(start_board)
+    if game.is_goal_state(start_key):
+        return [], 0
+    goal_key = goal_key_for(start_key)
+    if goal_key is None:
+        return None, 0
+    moves_for = game._solver_moves if prune else game._valid_moves
+
+    t0 = time.time()
+    nodes = 0
+    # fwd[key] = (parent_key, move di parent), bwd[key] = (child_key ke arah goal, move di key)
+    fwd = {start_key: (None, None)}
+    bwd = {goal_key: (None, None)}
+    fwd_layer = [start_key]
+    bwd_layer = [goal_key]
+
+    def join(meet, tail=None):
+        path_moves = []
+        cur = meet
+        while fwd[cur][0] is not None:
+            pk, mv = fwd[cur]
+            path_moves.append(mv)
+            cur = pk
+        path_moves.reverse()
+        if tail is not None:
+            path_moves.extend(tail)
+        else:
+            cur = meet
+            while bwd[cur][0] is not None:
+                nk, mv = bwd[cur]
+                path_moves.append(mv)
+                cur = nk
+        if tt is not None:
+            tt.record_plan(start_key, path_moves)
+        return game.canonical_path_to_screen(start_board, path_moves), nodes
+
+    while fwd_layer and bwd_layer:
+        next_layer = []
+        if len(fwd_layer) <= len(bwd_layer):
+            for key in fwd_layer:
+                nodes += 1
+                if nodes > max_nodes or time.time() - t0 > time_limit:
+                    return None, nodes
+                values = game.board_tubes(key)
+                for mv, child, _ in game.canonical_successors(key, values, moves_for(values)):
+                    if child in fwd:
+                        continue
+                    fwd[child] = (key, mv)
+                    if child in bwd:
+                        return join(child)
+                    tail = tt.plan_from(child) if tt is not None else None
+                    if tail is not None:
+                        return join(child, tail)
+                    next_layer.append(child)
+            fwd_layer = next_layer
+        else:
+            for key in bwd_layer:
+                nodes += 1
+                if nodes > max_nodes or time.time() - t0 > time_limit:
+                    return None, nodes
+                for pred, mv in canonical_predecessors(key, game.board_tubes(key)):
+                    if pred in bwd:
+                        continue
+                    bwd[pred] = (key, mv)
+                    if pred in fwd:
+                        return join(pred)
+                    next_layer.append(pred)
+            bwd_layer = next_layer
+
+    return None, nodes
+
+
+def board_stats(state):
+    """(heuristic, tabung yang sudah rapi & penuh) untuk membandingkan hasil generator"""
+    board = game.state_to_key(state)
+    solved = sum(1 for t in state if len(t) == game.BOTOL_CAPACITY and len(set(t)) == 1)
+    return game.heuristic(board), solved
+
+
+# ---------- Commands ----------
+
+def bench_keys():
+    """Tuple keys (lama) vs packed int board: hashing, memori per node, dan throughput A*"""
+    random.seed(1)
+    print(f"{'level':>5} {'states':>7} | {'key build us':>14} | {'dict ins+get us':>16} | "
+          f"{'bytes/node':>12} | {'A* nodes/s':>18}")
+    print(f"{'':>5} {'':>7} | {'tuple':>6} {'int':>7} | {'tuple':>7} {'int':>8} | "
+          f"{'tuple':>5} {'int':>6} | {'tuple':>8} {'int':>9}")
+    for level in sorted(game.LEVEL_CONFIG):
+        states = sample_states(level)
+        n = len(states)
+
+        t0 = time.perf_counter()
+        tuple_keys = [legacy_state_to_key(s) for s in states]
+        t_tuple_build = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        int_keys = [game.state_to_key(s) for s in states]
+        t_int_build = time.perf_counter() - t0
+
+        def dict_cost(keys):
+            t0 = time.perf_counter()
+            d = {}
+            for k in keys:
+                d[k] = 0
+            for k in keys:
+                d.get(k)
+            return time.perf_counter() - t0
+
+        t_tuple_dict = dict_cost(tuple_keys)
+        t_int_dict = dict_cost(int_keys)
+
+        # Memori: solver lama simpan tuple key + list-of-lists state tiap node,
+        # solver baru cuma simpan satu int
+        tracemalloc.start()
+        old_nodes = [(legacy_state_to_key(s), [list(t) for t in s]) for s in states]
+        old_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del old_nodes
+        tracemalloc.start()
+        new_nodes = [game.state_to_key(s) for s in states]
+        new_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del new_nodes
+
+        # Throughput A* dari beberapa level baru
+        starts = [quiet_generate(level) for _ in range(3)]
+        old_nodes_total = new_nodes_total = 0
+        t0 = time.perf_counter()
+        for s in starts:
+            old_nodes_total += legacy_astar_nodes(s)
+        t_old = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for s in starts:
+            new_nodes_total += packed_astar_nodes(s)
+        t_new = time.perf_counter() - t0
+
+        print(f"{level:>5} {n:>7} | {t_tuple_build / n * 1e6:>6.2f} {t_int_build / n * 1e6:>7.2f} | "
+              f"{t_tuple_dict / n * 1e6:>7.3f} {t_int_dict / n * 1e6:>8.3f} | "
+              f"{old_bytes // n:>5} {new_bytes // n:>6} | "
+              f"{old_nodes_total / t_old:>8.0f} {new_nodes_total / t_new:>9.0f}")
+
+
+def bench_canonical(boards="10"):
+    """Node yang di-expand A* dengan vs tanpa canonical key (level 3-5)"""
+    boards = int(boards)
+    random.seed(2)
+    print(f"{'level':>5} | {'nodes (plain)':>14} {'solved':>7} | {'nodes (canon)':>14} {'solved':>7} | {'drop':>6}")
+    for level in (3, 4, 5):
+        starts = [quiet_generate(level) for _ in range(boards)]
+        totals = {}
+        for canonical in (False, True):
+            nodes_total = solved = 0
+            for s in starts:
+                path, nodes = game.astar_search(s, time_limit=10, max_nodes=20000, canonical=canonical)
+                nodes_total += nodes
+                if path is not None:
+                    solved += 1
+            totals[canonical] = (nodes_total / boards, solved)
+        plain, canon = totals[False], totals[True]
+        print(f"{level:>5} | {plain[0]:>14.0f} {plain[1]:>7} | {canon[0]:>14.0f} {canon[1]:>7} | "
+              f"{1 - canon[0] / plain[0]:>6.1%}")
+
+
+def bench_memory(boards="10"):
+    """Peak memori, waktu, dan panjang solusi tiap engine hint (SOLVERS + bidir) per level"""
+    boards = int(boards)
+    random.seed(3)
+    print(f"{'level':>5} {'engine':>8} {'config':>7} | {'solved':>6} {'moves':>6} {'nodes':>7} | "
+          f"{'peak KiB':>9} {'ms':>7}")
+    for level in sorted(game.LEVEL_CONFIG):
+        starts = [quiet_generate(level) for _ in range(boards)]
+        for name, solver in dict(game.SOLVERS, bidir=bidirectional_search).items():
+            solved = moves = nodes = peak = 0
+            elapsed = 0.0
+            for s in starts:
+                tracemalloc.start()
+                t0 = time.perf_counter()
+                path, n = solver(s)
+                elapsed += time.perf_counter() - t0
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                nodes += n
+                if path is not None:
+                    solved += 1
+                    moves += len(path)
+            chosen = "*" if game.LEVEL_CONFIG[level].get("solver", "astar") == name else ""
+            print(f"{level:>5} {name:>8} {chosen:>7} | {solved:>6} {moves / max(solved, 1):>6.1f} "
+                  f"{nodes / boards:>7.0f} | {peak / 1024:>9.1f} {elapsed / boards * 1000:>7.1f}")
+
+
+def bench_pruning(boards="10"):
+    """Branching factor & latency hint: valid_moves_from vs solver_moves_from, semua level"""
+    boards = int(boards)
+    random.seed(4)
+    print(f"{'level':>5} | {'branching':>15} | {'hint ms (engine level)':>23} | {'solved':>9}")
+    print(f"{'':>5} | {'full':>7} {'pruned':>7} | {'full':>11} {'pruned':>11} | {'full':>4} {'pruned':>4}")
+    for level in sorted(game.LEVEL_CONFIG):
+        # branching dihitung di state canonical, sama seperti yang dilihat solver
+        keys = [game.canonical_key(game.state_to_key(s)) for s in sample_states(level, boards, 50)]
+        full = sum(len(game.valid_moves_from(k)) for k in keys) / len(keys)
+        pruned = sum(len(game.solver_moves_from(k)) for k in keys) / len(keys)
+
+        solver = game.SOLVERS[game.LEVEL_CONFIG[level].get("solver", "astar")]
+        starts = [quiet_generate(level) for _ in range(boards)]
+        result = {}
+        for prune in (False, True):
+            solved = 0
+            t0 = time.perf_counter()
+            for s in starts:
+                path, _ = solver(s, prune=prune)
+                if path is not None:
+                    solved += 1
+            result[prune] = ((time.perf_counter() - t0) / boards * 1000, solved)
+        print(f"{level:>5} | {full:>7.2f} {pruned:>7.2f} | {result[False][0]:>11.1f} {result[True][0]:>11.1f} | "
+              f"{result[False][1]:>4} {result[True][1]:>6}")
+
+
+def bench_generator(levels="300"):
+    """Generator lama (deepcopy) vs reverse_walk in-place: level/detik & statistik hasil"""
+    count = int(levels)
+    print(f"{'level':>5} {'depth':>5} | {'levels/s':>17} | {'mean h':>13} | {'solved tubes':>13}")
+    print(f"{'':>5} {'':>5} | {'old':>8} {'new':>8} | {'old':>6} {'new':>6} | {'old':>6} {'new':>6}")
+    for level in sorted(game.LEVEL_CONFIG):
+        game.use_level(level)
+        gen = game.WaterSortGenerator(level, seed=5)
+        results = {}
+        for name in ("old", "new"):
+            boards = []
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(count):
+                    if name == "old":
+                        boards.append(legacy_generate_with_bfs(gen))
+                    else:
+                        boards.append(gen.generate_with_bfs())
+            rate = count / (time.perf_counter() - t0)
+            stats = [board_stats(b) for b in boards]
+            results[name] = (rate, sum(h for h, _ in stats) / count, sum(d for _, d in stats) / count)
+        old, new = results["old"], results["new"]
+        print(f"{level:>5} {gen.target_depth:>5} | {old[0]:>8.0f} {new[0]:>8.0f} | "
+              f"{old[1]:>6.2f} {new[1]:>6.2f} | {old[2]:>6.2f} {new[2]:>6.2f}")
+
+
+def bench_certified(levels="200"):
+    """Mode certified: level/detik, penolakan, panjang solusi certified vs A*"""
+    count = int(levels)
+    print(f"{'level':>5} {'min':>4} | {'levels/s':>8} {'rejected':>9} | {'certified':>9} {'A*':>6} | {'mean h':>6}")
+    for level in sorted(game.LEVEL_CONFIG):
+        game.use_level(level)
+        gen = game.WaterSortGenerator(level, seed=6)
+        boards = []
+        rejected = 0
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(count):
+                boards.append(gen.generate_certified())
+                rejected += gen.rejected
+        rate = count / (time.perf_counter() - t0)
+        cert_len = astar_len = solved = 0
+        for tubes, solution in boards:
+            # solusi certified harus benar-benar sampai goal
+            board = game.state_to_key(tubes)
+            for mv in solution:
+                assert mv in game.valid_moves_from(board)
+                board = game.apply_move(board, mv)
+            assert game.is_goal_state(board)
+            cert_len += len(solution)
+            path, _ = game.astar_search(tubes)
+            if path is not None:
+                solved += 1
+                astar_len += len(path)
+        mean_h = sum(board_stats(t)[0] for t, _ in boards) / count
+        print(f"{level:>5} {gen.min_solution:>4} | {rate:>8.0f} {rejected / (rejected + count):>9.1%} | "
+              f"{cert_len / count:>9.1f} {astar_len / max(solved, 1):>6.1f} | {mean_h:>6.2f}")
+
+
+GENERATOR_MODES = ("certified", "bfs", "batch")
+
+
+def generated_levels(level, count, seed, mode):
+    """count level dari generator mode ini. Yield (tubes, solusi certified | None,
+    langkah walk, walk berhenti awal, attempt ditolak)"""
+    game.use_level(level)
+    if mode == "batch":
+        batch = game.BatchGenerator(level, seed)
+        slots, fill, walk_steps, stuck = batch.generate(count)
+        for i in range(count):
+            yield batch.to_tubes(slots, fill, i), None, int(walk_steps[i]), bool(stuck[i]), 0
+        return
+    gen = game.WaterSortGenerator(level, seed)
+    for _ in range(count):
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == "bfs":
+                tubes, solution = gen.generate_with_bfs(), None
+            else:
+                tubes, solution = gen.generate_certified()
+        yield tubes, solution, gen.walk_steps, gen.stopped_early, gen.rejected
+
+
+def pack_chunk(level, count, seed, mode):
+    """Di worker process: count level -> list (tubes, panjang solusi (0 = tidak diketahui), canonical hash)"""
+    return [(tubes, 0 if solution is None else len(solution), game.canonical_board_hash(tubes))
+            for tubes, solution, _, _, _ in generated_levels(level, count, seed, mode)]
+
+
+def build_pack(path=game.LEVEL_PACK_PATH, per_tier="1000", mode="bfs", chunk="200"):
+    """Buat level pack (mmap) berisi per_tier level untuk tiap level di LEVEL_CONFIG, tanpa duplikat.
+    mode: bfs (seperti game) / certified (panjang solusi diketahui) / batch (numpy, panjang solusi 0)"""
+    per_tier, chunk = int(per_tier), int(chunk)
+    if mode not in GENERATOR_MODES:
+        raise SystemExit(f"mode harus salah satu dari {GENERATOR_MODES}")
+    flags = game.PACK_CERTIFIED if mode == "certified" else 0
+    t0 = time.perf_counter()
+    # dedup satu kali jalan: cuma hash yang disimpan (Bloom filter), board langsung ditulis
+    seen = game.BloomFilter(per_tier * len(game.LEVEL_CONFIG))
+    duplicates = 0
+
+    def entries(jobs):
+        nonlocal duplicates
+        while jobs:
+            level, job = jobs.popleft()
+            for tubes, length, h in job.result():
+                if seen.add(h):
+                    yield level, tubes, length, flags
+                else:
+                    duplicates += 1
+
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        jobs = deque()
+        for level in sorted(game.LEVEL_CONFIG):
+            for k, start in enumerate(range(0, per_tier, chunk)):
+                seed = level * 1_000_003 + k
+                jobs.append((level, pool.submit(pack_chunk, level, min(chunk, per_tier - start), seed, mode)))
+        count = game.write_level_pack(path, entries(jobs))
+    print(f"{path}: {count} level, {duplicates} duplikat dibuang, {os.path.getsize(path)} byte, "
+          f"{time.perf_counter() - t0:.1f}s")
+    pack_info(path)
+
+
+def pack_info(path=game.LEVEL_PACK_PATH):
+    """Isi level pack: jumlah level per tier & distribusi panjang solusi"""
+    library = game.LevelLibrary(path)
+    print(f"{library.record_count} level")
+    print(f"{'tier':>4} {'levels':>8} {'byte/lvl':>8} | panjang solusi: jumlah")
+    for tier in sorted(library.index):
+        spread = " ".join(f"{d}:{c}" for d, c, _ in library.index[tier])
+        print(f"{tier:>4} {library.count(tier):>8} {library.record_bytes(tier):>8.0f} | {spread}")
+    library.close()
+
+
+def show_level(level="1", seed="0", mode="bfs"):
+    """Print board untuk (level, seed): sama persis di mesin mana pun. mode: bfs / certified"""
+    game.use_level(int(level))
+    gen = game.WaterSortGenerator(int(level), int(seed))
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "bfs":
+            tubes, solution = gen.generate_with_bfs(), None
+        else:
+            tubes, solution = gen.generate_certified()
+    for i, tube in enumerate(tubes):
+        print(f"{i:>2}: {tube}")
+    if solution is not None:
+        print(f"solusi ({len(solution)} langkah): {solution}")
+
+
+def calibrate_chunk(level, count, seed, mode, time_limit):
+    """Di worker process: generate + solve count level.
+    Return list (solve detik, panjang solusi solver | None, panjang certified | None,
+    langkah walk, walk berhenti awal, attempt ditolak)"""
+    solver = game.SOLVERS[game.LEVEL_CONFIG[level].get("solver", "astar")]
+    rows = []
+    for tubes, certified, walk_steps, stopped_early, rejected in generated_levels(level, count, seed, mode):
+        t0 = time.perf_counter()
+        path, _ = solver(tubes, time_limit=time_limit)
+        elapsed = time.perf_counter() - t0
+        rows.append((elapsed, None if path is None else len(path),
+                     None if certified is None else len(certified),
+                     walk_steps, stopped_early, rejected))
+    return rows
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def calibrate(per_tier="10000", time_limit="0.8", mode="bfs", chunk="250"):
+    """Kalibrasi tier LEVEL_CONFIG: generate per_tier level/tier di semua core, solve dengan
+    engine tier (dibatasi time_limit), tabel waktu solve, panjang solusi, unsolved & walk berhenti awal"""
+    per_tier, time_limit, chunk = int(per_tier), float(time_limit), int(chunk)
+    if mode not in GENERATOR_MODES:
+        raise SystemExit(f"mode harus salah satu dari {GENERATOR_MODES}")
+    t0 = time.perf_counter()
+    rows = {level: [] for level in game.LEVEL_CONFIG}
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        jobs = []
+        for level in sorted(game.LEVEL_CONFIG):
+            for k, start in enumerate(range(0, per_tier, chunk)):
+                seed = level * 1_000_003 + k
+                jobs.append((level, pool.submit(calibrate_chunk, level, min(chunk, per_tier - start),
+                                                seed, mode, time_limit)))
+        for level, job in jobs:
+            rows[level].extend(job.result())
+
+    print(f"{per_tier} level/tier, mode {mode}, time_limit {time_limit}s, "
+          f"{os.cpu_count()} core, {time.perf_counter() - t0:.1f}s")
+    print(f"{'tier':>4} {'depth':>5} {'solver':>7} | {'solve ms p50':>12} {'p90':>7} {'p99':>7} {'max':>7} | "
+          f"{'len p50':>7} {'p90':>4} {'cert':>5} | {'walk':>5} {'unsolved':>8} {'early':>6} {'reject':>6}")
+    for level in sorted(rows):
+        data = rows[level]
+        cfg = game.LEVEL_CONFIG[level]
+        times = sorted(r[0] * 1000 for r in data)
+        lengths = sorted(r[1] for r in data if r[1] is not None)
+        certified = [r[2] for r in data if r[2] is not None]
+        unsolved = sum(r[1] is None for r in data) / len(data)
+        early = sum(r[4] for r in data) / len(data)
+        rejected = sum(r[5] for r in data)
+        cert_mean = sum(certified) / len(certified) if certified else float("nan")
+        walk_mean = sum(r[3] for r in data) / len(data)
+        print(f"{level:>4} {cfg['depth']:>5} {cfg.get('solver', 'astar'):>7} | "
+              f"{percentile(times, 0.5):>12.1f} {percentile(times, 0.9):>7.1f} {percentile(times, 0.99):>7.1f} "
+              f"{times[-1]:>7.1f} | {percentile(lengths, 0.5):>7} {percentile(lengths, 0.9):>4} {cert_mean:>5.1f} | "
+              f"{walk_mean:>5.1f} {unsolved:>8.1%} {early:>6.1%} {rejected / (rejected + len(data)):>6.1%}")
+
+
+def bench_batch(levels="20000"):
+    """generate_with_bfs vs BatchGenerator (numpy): level/detik & statistik board (h, tabung rapi, A*)"""
+    count = int(levels)
+    sample = min(count, 300)
+    print(f"{'level':>5} | {'levels/s':>17} | {'mean h':>13} | {'solved tubes':>13} | {'A* len':>13}")
+    print(f"{'':>5} | {'loop':>8} {'batch':>8} | {'loop':>6} {'batch':>6} | {'loop':>6} {'batch':>6} | "
+          f"{'loop':>6} {'batch':>6}")
+    for level in sorted(game.LEVEL_CONFIG):
+        game.use_level(level)
+        gen = game.WaterSortGenerator(level, seed=7)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loop_boards = [gen.generate_with_bfs() for _ in range(count)]
+        loop_rate = count / (time.perf_counter() - t0)
+
+        batch = game.BatchGenerator(level, seed=7)
+        t0 = time.perf_counter()
+        slots, fill, _, _ = batch.generate(count)
+        batch_rate = count / (time.perf_counter() - t0)
+        batch_boards = [batch.to_tubes(slots, fill, i) for i in range(sample)]
+
+        results = []
+        for boards in (loop_boards[:sample], batch_boards):
+            stats = [board_stats(b) for b in boards]
+            paths = [game.astar_search(b)[0] for b in boards]
+            solved = [len(p) for p in paths if p is not None]
+            results.append((sum(h for h, _ in stats) / sample, sum(d for _, d in stats) / sample,
+                            sum(solved) / max(len(solved), 1)))
+        loop, vec = results
+        print(f"{level:>5} | {loop_rate:>8.0f} {batch_rate:>8.0f} | {loop[0]:>6.2f} {vec[0]:>6.2f} | "
+              f"{loop[1]:>6.2f} {vec[1]:>6.2f} | {loop[2]:>6.1f} {vec[2]:>6.1f}")
+
+
+def bench_scaling(levels="50", time_limit="0.8"):
+    """Skala generator & solver per tier saat warna / capacity naik: level/detik, node/detik A*,
+    solve rate & waktu engine tier di board certified"""
+    count, time_limit = int(levels), float(time_limit)
+    print(f"{'level':>5} {'col':>3} {'cap':>3} {'tubes':>5} {'bits':>5} | {'bfs/s':>7} {'cert/s':>7} | "
+          f"{'A* nodes/s':>10} | {'solver':>7} {'solved':>7} {'ms avg':>7} {'len':>5} {'cert':>5}")
+    for level in sorted(game.LEVEL_CONFIG):
+        cfg = game.use_level(level)
+        gen = game.WaterSortGenerator(level, seed=8)
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            for _ in range(count):
+                gen.generate_with_bfs()
+            bfs_rate = count / (time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            boards = [gen.generate_certified() for _ in range(count)]
+            cert_rate = count / (time.perf_counter() - t0)
+
+        # node/detik A*: dibatasi node, bukan waktu, supaya tiap tier kerja sebanyak yang sama
+        nodes = 0
+        t0 = time.perf_counter()
+        for tubes, _ in boards[:10]:
+            nodes += game.astar_search(tubes, time_limit=60, max_nodes=2000)[1]
+        nodes_rate = nodes / (time.perf_counter() - t0)
+
+        solver = game.SOLVERS[cfg.get("solver", "astar")]
+        lengths = []
+        t0 = time.perf_counter()
+        for tubes, _ in boards:
+            path, _ = solver(tubes, time_limit=time_limit)
+            if path is not None:
+                lengths.append(len(path))
+        solve_ms = (time.perf_counter() - t0) * 1000 / count
+        tubes_n = cfg["colors"] + cfg["empty"]
+        print(f"{level:>5} {cfg['colors']:>3} {cfg['capacity']:>3} {tubes_n:>5} "
+              f"{tubes_n * game.TUBE_BITS + 1:>5} | {bfs_rate:>7.0f} {cert_rate:>7.0f} | {nodes_rate:>10.0f} | "
+              f"{cfg.get('solver', 'astar'):>7} {len(lengths) / count:>7.0%} {solve_ms:>7.1f} "
+              f"{sum(lengths) / max(len(lengths), 1):>5.1f} {sum(len(sol) for _, sol in boards) / count:>5.1f}")
+
+
+def bench_mix(levels="200", time_limit="0.5"):
+    """generate_with_bfs sampai target_depth vs berhenti di target mix score: level/detik,
+    langkah walk, panjang solusi engine tier (rata-rata & simpangan)"""
+    count, time_limit = int(levels), float(time_limit)
+    print(f"{'level':>5} {'mix':>4} | {'levels/s':>15} | {'walk steps':>13} | {'solution len':>15} | "
+          f"{'len sd':>11} | {'solved':>11}")
+    print(f"{'':>5} {'':>4} | {'depth':>7} {'mix':>7} | {'depth':>6} {'mix':>6} | {'depth':>7} {'mix':>7} | "
+          f"{'depth':>5} {'mix':>5} | {'depth':>5} {'mix':>5}")
+    for level in sorted(game.LEVEL_CONFIG):
+        cfg = game.use_level(level)
+        solver = game.SOLVERS[cfg.get("solver", "astar")]
+        results = []
+        for target in (None, cfg.get("mix")):
+            gen = game.WaterSortGenerator(level, seed=9)
+            gen.target_mix = target
+            boards, steps = [], 0
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(count):
+                    boards.append(gen.generate_with_bfs())
+                    steps += gen.walk_steps
+            rate = count / (time.perf_counter() - t0)
+            lengths = [len(p) for p in (solver(b, time_limit=time_limit)[0] for b in boards) if p is not None]
+            results.append((rate, steps / count, statistics.mean(lengths), statistics.pstdev(lengths),
+                            len(lengths) / count))
+        full, mixed = results
+        print(f"{level:>5} {cfg.get('mix', '-'):>4} | {full[0]:>7.0f} {mixed[0]:>7.0f} | {full[1]:>6.1f} {mixed[1]:>6.1f} | "
+              f"{full[2]:>7.2f} {mixed[2]:>7.2f} | {full[3]:>5.2f} {mixed[3]:>5.2f} | {full[4]:>5.0%} {mixed[4]:>5.0%}")
+
+
+def shuffled_board(tubes, rng):
+    """Board yang sama dengan urutan tabung & nama warna diacak"""
+    colors = sorted({c for tube in tubes for c in tube})
+    relabel = dict(zip(colors, rng.sample(colors, len(colors))))
+    mirror = [[relabel[c] for c in tube] for tube in tubes]
+    rng.shuffle(mirror)
+    return mirror
+
+
+def bench_dedup(levels="20000"):
+    """Canonical hash: invarian (acak urutan tabung & warna, semua board), hash/detik, duplikat per tier,
+    memori Bloom filter vs set hash vs set board"""
+    count = int(levels)
+    rng = random.Random(10)
+    print(f"{'level':>5} | {'hash/s':>7} | {'dup exact':>9} {'dup canon':>9} {'bloom':>6} | "
+          f"{'bloom KiB':>9} {'set(hash) KiB':>13} {'set(board) KiB':>14}")
+    for level in sorted(game.LEVEL_CONFIG):
+        game.use_level(level)
+        gen = game.WaterSortGenerator(level, seed=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            boards = [gen.generate_with_bfs() for _ in range(count)]
+
+        t0 = time.perf_counter()
+        hashes = [game.canonical_board_hash(tubes) for tubes in boards]
+        rate = count / (time.perf_counter() - t0)
+
+        # tiap board dengan tabung & warna diacak (plus gabungan 2 salinan board, banyak simetri)
+        # harus punya hash yang sama
+        for tubes, h in zip(boards, hashes):
+            assert game.canonical_board_hash(shuffled_board(tubes, rng)) == h, tubes
+        for tubes in boards[:200]:
+            double = tubes + [[c + len(game.COLOR_MAP) for c in tube] for tube in tubes]
+            assert game.canonical_board_hash(shuffled_board(double, rng)) == game.canonical_board_hash(double), tubes
+        bloom = game.BloomFilter(count)
+        bloom_dup = sum(not bloom.add(h) for h in hashes)
+        exact = {game.state_to_key(tubes) for tubes in boards}
+        hash_set = set(hashes)
+        set_kib = (sys.getsizeof(hash_set) + sum(sys.getsizeof(h) for h in hash_set)) / 1024
+        board_kib = (sys.getsizeof(exact) + sum(sys.getsizeof(k) for k in exact)) / 1024
+        print(f"{level:>5} | {rate:>7.0f} | {count - len(exact):>9} {count - len(hash_set):>9} {bloom_dup:>6} | "
+              f"{len(bloom.bits) / 1024:>9.1f} {set_kib:>13.1f} {board_kib:>14.1f}")
+
+
+
+def render_scenes(level):
+    """(nama, fungsi gambar satu frame penuh) untuk tiap layar game; layar main dari setup_level(level)"""
+    game.screen = game.pygame.display.set_mode([game.WIDTH, game.HEIGHT])
+    game.level_pool = game.LevelPool(levels=[])
+    with contextlib.redirect_stdout(io.StringIO()):
+        game.setup_level(level)
+    game.stop_hint_jobs()
+
+    def play(won):
+        def draw():
+            game.game_won, game.stars = won, 3 if won else 0
+            game.renderer.invalidate()
+            game.draw_game_interface()
+            game.renderer.flush()
+        return draw
+
+    return [("menu", game.draw_start_menu), ("level select", game.draw_level_select),
+            ("play", play(False)), ("win", play(True))]
+
+
+def frame_ms(draw, frames):
+    draw()
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        draw()
+    return (time.perf_counter() - t0) / frames * 1000
+
+
+def legacy_draw_tube(i, num_tubes, tube, style, lift):
+    """draw_tube lama: tiap unit air & outline digambar ulang dengan pygame.draw.rect (rounded)"""
+    border_color, thickness = game.TUBE_STYLES[style]
+    x, y, tube_width, tube_height, column = game.tube_slot(i, num_tubes)
+    y -= lift
+    game.screen.fill(game.BG_COLOR, column)
+    h_unit = tube_height / game.BOTOL_CAPACITY
+    for idx, color_code in enumerate(tube):
+        color = game.COLOR_MAP.get(color_code, (255, 255, 255))
+        water_y = (y + tube_height) - ((idx + 1) * h_unit)
+        game.pygame.draw.rect(game.screen, color, [int(x + 5), int(water_y), int(tube_width - 10), int(h_unit)], 0, 8)
+    game.pygame.draw.rect(game.screen, border_color, game.pygame.Rect(int(x), int(y), tube_width, tube_height), thickness, 8)
+    return column
+
+
+def legacy_draw_win_overlay():
+    """draw_win_overlay lama: surface gelap full screen, teks dan polygon bintang dibuat tiap frame"""
+    pygame, screen = game.pygame, game.screen
+    s = pygame.Surface((game.WIDTH, game.HEIGHT))
+    s.set_alpha(150)
+    s.fill((0, 0, 0))
+    screen.blit(s, (0, 0))
+    texts = [
+        (game.large_font.render('LEVEL COMPLETED!', True, (0, 255, 0)), (game.WIDTH // 2 - 180, game.HEIGHT // 2 - 50)),
+        (game.font.render('Press ENTER for Next Level', True, 'white'), (game.WIDTH // 2 - 140, game.HEIGHT // 2 + 10)),
+        (game.font.render(f"HINT USED: {game.hint_used}", True, "white"), (395, 390)),
+        (game.font.render(f"MOVE: {game.move_count}", True, "white"), (410, 420)),
+        (game.font.render(f"SCORE: {game.player_score}", True, "white"), (400, 350)),
+    ]
+    for text, pos in texts:
+        screen.blit(text, pos)
+    total_width = (game.stars - 1) * 60
+    for s_idx in range(game.stars):
+        x, y, size = game.WIDTH // 2 - (total_width // 2) + s_idx * 60, game.HEIGHT // 2 - 100, 30
+        pts = [(int(x + size * dx), int(y + size * dy)) for dx, dy in
+               ((0, -1), (0.2245, -0.3090), (1, -0.3090), (0.3633, 0.1180), (0.5878, 1),
+                (0, 0.3819), (-0.5878, 1), (-0.3633, 0.1180), (-1, -0.3090), (-0.2245, -0.3090))]
+        pygame.draw.polygon(screen, game.STAR_COLOR, pts)
+
+
+def bench_render(frames="300", level="5"):
+    """ms per frame yang digambar penuh (menu, level select, layar main, layar menang): tanpa cache,
+    + text cache, + atlas tabung, + overlay menang yang di-cache. Headless: SDL_VIDEODRIVER=dummy"""
+    frames = int(frames)
+    scenes = render_scenes(int(level))
+    draw_tube, draw_win_overlay = game.draw_tube, game.draw_win_overlay
+    variants = [(0, legacy_draw_tube, legacy_draw_win_overlay),
+                (game.TEXT_CACHE_SIZE, legacy_draw_tube, legacy_draw_win_overlay),
+                (game.TEXT_CACHE_SIZE, draw_tube, legacy_draw_win_overlay),
+                (game.TEXT_CACHE_SIZE, draw_tube, draw_win_overlay)]
+    print(f"level {level}, {len(game.tubes)} tabung")
+    print(f"{'scene':<12} | {'plain ms':>8} {'text ms':>8} {'+atlas ms':>9} {'+overlay ms':>11} | {'speedup':>7}")
+    for name, draw in scenes:
+        times = []
+        for cache_size, game.draw_tube, game.draw_win_overlay in variants:
+            game.text_cache = game.TextCache(max_size=cache_size)
+            times.append(frame_ms(draw, frames))
+        print(f"{name:<12} | {times[0]:>8.3f} {times[1]:>8.3f} {times[2]:>9.3f} {times[3]:>11.3f} | "
+              f"{times[0] / times[3]:>6.2f}x")
+    game.draw_tube, game.draw_win_overlay = draw_tube, draw_win_overlay
+    print(f"text cache: {len(game.text_cache)} surface, {game.text_cache.hits} hit, {game.text_cache.misses} miss")
+
+COMMANDS = {
+    "bench-keys": bench_keys,
+    "bench-canonical": bench_canonical,
+    "bench-memory": bench_memory,
+    "bench-pruning": bench_pruning,
+    "bench-generator": bench_generator,
+    "bench-certified": bench_certified,
+    "build-pack": build_pack,
+    "pack-info": pack_info,
+    "show-level": show_level,
+    "calibrate": calibrate,
+    "bench-batch": bench_batch,
+    "bench-scaling": bench_scaling,
+    "bench-mix": bench_mix,
+    "bench-dedup": bench_dedup,
+    "bench-render": bench_render,
+}
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in COMMANDS:
+        print("Usage: python puzzle_tools.py <command>")
+        for name, fn in COMMANDS.items():
+            print(f"  {name:<16} {fn.__doc__}")
+        return 1
+    COMMANDS[argv[1]](*argv[2:])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))